@@ -0,0 +1,92 @@
+"""
+크롤링 진행 상황 체크포인트 (recipe_video_id 단위)
+
+영상마다 stats(조회수/재생시간) → transcript(자막) → steps(GPT 조리 과정) 단계별 상태를 기록해서,
+중간에 멈춰도 다시 실행하면 끝난 영상은 건너뛰고 실패한 단계만 다시 시도합니다.
+자막은 data/transcripts/{recipe_video_id}.txt 에 저장해서 GPT 단계만 다시 돌릴 때 재사용합니다.
+"""
+import os
+import json
+import threading
+from datetime import datetime
+
+STAGES = ('stats', 'transcript', 'steps')
+# 앞 단계가 끝나야 실행할 수 있는 단계 (앞 단계가 재시도 한도를 넘기면 이 단계도 더 이상 시도하지 않음)
+REQUIRES = {'steps': 'transcript'}
+
+# 같은 단계를 이 횟수만큼 실패하면 더 이상 재시도하지 않음 (자막이 아예 없는 영상 등)
+MAX_ATTEMPTS = int(os.getenv("SCRAPE_MAX_ATTEMPTS", "3"))
+
+
+def normalize_id(recipe_video_id):
+    return str(int(float(recipe_video_id)))
+
+
+class Manifest:
+    def __init__(self, path):
+        self.path = path
+        self.transcript_dir = os.path.join(os.path.dirname(path), 'transcripts')
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def entry(self, recipe_video_id):
+        return self.entries.get(normalize_id(recipe_video_id), {})
+
+    def is_done(self, recipe_video_id, stage):
+        return self.entry(recipe_video_id).get(stage, {}).get('status') == 'done'
+
+    def should_run(self, recipe_video_id, stage):
+        state = self.entry(recipe_video_id).get(stage, {})
+        if state.get('status') == 'done' or state.get('attempts', 0) >= MAX_ATTEMPTS:
+            return False
+        required = REQUIRES.get(stage)
+        return required is None or self.is_done(recipe_video_id, required) or self.should_run(recipe_video_id, required)
+
+    def needs_work(self, recipe_video_id):
+        return any(self.should_run(recipe_video_id, stage) for stage in STAGES)
+
+    def mark(self, recipe_video_id, stage, ok, error=None, **data):
+        """단계 결과 기록 (data는 영상 정보로 같이 저장: view_count, duration 등)"""
+        key = normalize_id(recipe_video_id)
+        with self.lock:
+            entry = self.entries.setdefault(key, {})
+            state = entry.setdefault(stage, {})
+            state['status'] = 'done' if ok else 'failed'
+            state['attempts'] = state.get('attempts', 0) + 1
+            state['at'] = datetime.now().isoformat(timespec='seconds')
+            if error:
+                state['error'] = str(error)[:300]
+            else:
+                state.pop('error', None)
+            entry.update(data)
+            self._save()
+
+    def _save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def save_transcript(self, recipe_video_id, text):
+        os.makedirs(self.transcript_dir, exist_ok=True)
+        with open(os.path.join(self.transcript_dir, f"{normalize_id(recipe_video_id)}.txt"), 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def load_transcript(self, recipe_video_id):
+        path = os.path.join(self.transcript_dir, f"{normalize_id(recipe_video_id)}.txt")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+    def summary(self):
+        counts = {stage: {'done': 0, 'failed': 0} for stage in STAGES}
+        for entry in self.entries.values():
+            for stage in STAGES:
+                status = entry.get(stage, {}).get('status')
+                if status in ('done', 'failed'):
+                    counts[stage][status] += 1
+        return counts
@@ -0,0 +1,269 @@
+"""
+OpenAI 호출 공용 모듈 (scraper / whisper / youtube-api / rag 에서 같이 사용)
+
+- 프로세스 전체에서 클라이언트 하나 (httpx 커넥션 풀 + keep-alive)
+- 모든 호출이 같은 요청 간격 제한기(OPENAI_RPM)를 공유
+- 429 / 5xx / 연결 오류는 지수 백오프로 재시도 (할당량 소진은 바로 실패)
+- 모델별 호출 수 / 토큰 수 / 소요 시간 집계 (usage_summary)
+- OPENAI_MODE 로 녹화/재생 (data/openai_fixtures/)
+    live   : 실제 호출 (기본값)
+    record : 실제 호출하고 요청/응답을 fixture 로 저장
+    replay : fixture 에서만 응답 (API 키/네트워크 없이 실행, 없으면 FixtureMissingError)
+    auto   : fixture 가 있으면 재생, 없으면 호출 후 저장
+
+응답은 SDK 객체가 아니라 str / dict / list 로 돌려줘서 fixture 로 그대로 저장할 수 있게 합니다.
+"""
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+
+from dotenv import load_dotenv
+
+from common.ratelimit import RateLimiter
+
+try:
+    from langchain_core.embeddings import Embeddings as _EmbeddingsBase
+except ImportError:
+    _EmbeddingsBase = object
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+OPENAI_MODE = os.getenv("OPENAI_MODE", "live").strip().lower()
+FIXTURES_DIR = os.getenv("OPENAI_FIXTURES_DIR", os.path.join(BASE_DIR, 'data', 'openai_fixtures'))
+OPENAI_RPM = float(os.getenv("OPENAI_RPM", "500"))               # 분당 최대 요청 수 (0이면 제한 없음)
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRY_ERRORS = {'APIConnectionError', 'APITimeoutError'}
+
+if OPENAI_MODE not in ('live', 'record', 'replay', 'auto'):
+    print(f"⚠️ 알 수 없는 OPENAI_MODE={OPENAI_MODE}, live 로 실행합니다.")
+    OPENAI_MODE = 'live'
+
+
+class FixtureMissingError(RuntimeError):
+    """replay 모드인데 녹화된 응답이 없음"""
+
+
+_client = None
+_client_lock = threading.Lock()
+_limiter = RateLimiter(OPENAI_RPM)
+
+_usage = {}
+_usage_lock = threading.Lock()
+
+
+def get_client():
+    """커넥션 풀을 쓰는 OpenAI 클라이언트 (재시도는 여기서 직접 하므로 SDK 재시도는 끔)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            import httpx
+            from openai import OpenAI
+
+            http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_CONNECTIONS),
+                timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=10.0),
+            )
+            _client = OpenAI(
+                api_key=(os.getenv("OPENAI_API_KEY") or "").strip(),
+                base_url=os.getenv("OPENAI_API_BASE"),
+                http_client=http_client,
+                max_retries=0,
+            )
+        return _client
+
+
+def has_credentials():
+    return OPENAI_MODE == 'replay' or bool(os.getenv("OPENAI_API_KEY"))
+
+
+# ---------------------------------------------------------
+# 집계
+# ---------------------------------------------------------
+def _record_usage(model, seconds=0.0, prompt_tokens=0, completion_tokens=0, audio_seconds=0.0, replayed=False):
+    with _usage_lock:
+        u = _usage.setdefault(model, {'calls': 0, 'replayed': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'audio_seconds': 0.0, 'seconds': 0.0})
+        u['replayed' if replayed else 'calls'] += 1
+        u['prompt_tokens'] += prompt_tokens or 0
+        u['completion_tokens'] += completion_tokens or 0
+        u['audio_seconds'] += audio_seconds or 0.0
+        u['seconds'] += seconds
+
+
+def usage_summary():
+    """{모델: {calls, replayed, prompt_tokens, completion_tokens, audio_seconds, seconds}}"""
+    with _usage_lock:
+        return {model: dict(u, seconds=round(u['seconds'], 2)) for model, u in _usage.items()}
+
+
+def print_usage():
+    for model, u in usage_summary().items():
+        print(f"🤖 {model}: 호출 {u['calls']}건(재생 {u['replayed']}건) / 입력 {u['prompt_tokens']:,} · 출력 {u['completion_tokens']:,} 토큰 / {u['seconds']}초")
+
+
+# ---------------------------------------------------------
+# 녹화 / 재생
+# ---------------------------------------------------------
+def _fixture_key(kind, payload):
+    raw = json.dumps([kind, payload], ensure_ascii=False, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()
+
+
+def _fixture_path(kind, key):
+    return os.path.join(FIXTURES_DIR, kind, key[:2], f"{key}.json")
+
+
+def _load_fixture(kind, key):
+    if OPENAI_MODE not in ('replay', 'auto'):
+        return None
+    path = _fixture_path(kind, key)
+    if not os.path.exists(path):
+        if OPENAI_MODE == 'replay':
+            raise FixtureMissingError(f"녹화된 응답 없음: {kind}/{key[:12]} (OPENAI_MODE=record 로 먼저 실행하세요)")
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['response']
+
+
+def _save_fixture(kind, key, request, response):
+    if OPENAI_MODE not in ('record', 'auto'):
+        return
+    path = _fixture_path(kind, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'request': request, 'response': response}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+# ---------------------------------------------------------
+# 재시도
+# ---------------------------------------------------------
+def _is_retryable(e):
+    if getattr(e, 'code', None) == 'insufficient_quota':
+        return False
+    return getattr(e, 'status_code', None) in RETRY_STATUS or type(e).__name__ in RETRY_ERRORS
+
+
+def _call(fn):
+    """rate limit + 재시도. return: (응답, 걸린 시간)"""
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        _limiter.wait()
+        started = time.monotonic()
+        try:
+            return fn(), time.monotonic() - started
+        except Exception as e:
+            if attempt >= OPENAI_MAX_RETRIES or not _is_retryable(e):
+                raise
+            wait = min(2 ** attempt, 30) + random.uniform(0, 1)
+            print(f"⚠️ OpenAI 요청 실패({type(e).__name__}), {wait:.1f}초 후 재시도...")
+            time.sleep(wait)
+
+
+# ---------------------------------------------------------
+# API
+# ---------------------------------------------------------
+def chat(messages, model="gpt-4o", **kwargs):
+    """chat.completions → 응답 텍스트"""
+    request = {'model': model, 'messages': messages, **kwargs}
+    key = _fixture_key('chat', request)
+    cached = _load_fixture('chat', key)
+    if cached is not None:
+        _record_usage(model, replayed=True, **cached['usage'])
+        return cached['content']
+
+    response, seconds = _call(lambda: get_client().chat.completions.create(model=model, messages=messages, **kwargs))
+    usage = {
+        'prompt_tokens': getattr(response.usage, 'prompt_tokens', 0) if response.usage else 0,
+        'completion_tokens': getattr(response.usage, 'completion_tokens', 0) if response.usage else 0,
+    }
+    content = response.choices[0].message.content or ""
+    _record_usage(model, seconds, **usage)
+    _save_fixture('chat', key, request, {'content': content, 'usage': usage})
+    return content
+
+
+def _segment_dict(seg):
+    get = seg.get if isinstance(seg, dict) else (lambda k, d=None: getattr(seg, k, d))
+    return {'start': float(get('start', 0.0) or 0.0), 'end': float(get('end', 0.0) or 0.0), 'text': get('text', '') or ''}
+
+
+def transcribe(path, model="whisper-1", **kwargs):
+    """
+    audio.transcriptions → {'text': str, 'duration': 초, 'segments': [{'start', 'end', 'text'}, ...]}
+    (duration / segments 는 response_format="verbose_json" 일 때만 채워짐)
+    """
+    with open(path, 'rb') as f:
+        audio_hash = hashlib.sha256(f.read()).hexdigest()
+    request = {'model': model, 'audio_sha256': audio_hash, **kwargs}
+    key = _fixture_key('transcribe', request)
+    cached = _load_fixture('transcribe', key)
+    if cached is not None:
+        _record_usage(model, audio_seconds=cached.get('duration', 0.0), replayed=True)
+        return cached
+
+    def create():
+        with open(path, 'rb') as audio_file:
+            return get_client().audio.transcriptions.create(model=model, file=audio_file, **kwargs)
+
+    response, seconds = _call(create)
+    result = {
+        'text': getattr(response, 'text', '') or '',
+        'duration': float(getattr(response, 'duration', 0.0) or 0.0),
+        'segments': [_segment_dict(s) for s in (getattr(response, 'segments', None) or [])],
+    }
+    _record_usage(model, seconds, audio_seconds=result['duration'])
+    _save_fixture('transcribe', key, request, result)
+    return result
+
+
+def embed(texts, model="text-embedding-3-small"):
+    """
+    embeddings → 벡터 리스트.
+    fixture 는 텍스트 단위로 저장해서, 배치 크기가 달라져도 그대로 재생됩니다.
+    """
+    vectors = [None] * len(texts)
+    keys = [_fixture_key('embed', {'model': model, 'input': t}) for t in texts]
+    missing = []
+    for i, key in enumerate(keys):
+        cached = _load_fixture('embed', key)
+        if cached is not None:
+            vectors[i] = cached
+            _record_usage(model, replayed=True)
+        else:
+            missing.append(i)
+
+    if missing:
+        batch = [texts[i] for i in missing]
+        response, seconds = _call(lambda: get_client().embeddings.create(model=model, input=batch))
+        _record_usage(model, seconds, prompt_tokens=getattr(response.usage, 'prompt_tokens', 0) if response.usage else 0)
+        for i, item in zip(missing, sorted(response.data, key=lambda d: d.index)):
+            vectors[i] = list(item.embedding)
+            _save_fixture('embed', keys[i], {'model': model, 'input': texts[i]}, vectors[i])
+    return vectors
+
+
+class Embeddings(_EmbeddingsBase):
+    """LangChain(Chroma) 에 넘기는 임베딩: OpenAIEmbeddings 대신 이 모듈의 embed() 사용"""
+
+    def __init__(self, model="text-embedding-3-small", chunk_size=100):
+        self.model = model
+        self.chunk_size = chunk_size
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        vectors = []
+        for i in range(0, len(texts), self.chunk_size):
+            vectors.extend(embed(texts[i:i + self.chunk_size], model=self.model))
+        return vectors
+
+    def embed_query(self, text):
+        return embed([text], model=self.model)[0]
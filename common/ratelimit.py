@@ -0,0 +1,46 @@
+"""
+여러 스레드가 공유하는 요청 간격 제한기
+
+- RateLimiter       : 분당 요청 수(rpm) 기준 (OpenAI 등 API 호출)
+- DomainRateLimiter : 도메인별 최소 간격 + 랜덤 지터 (YouTube 페이지/자막 요청)
+"""
+import time
+import random
+import threading
+from urllib.parse import urlparse
+
+
+class RateLimiter:
+    """요청 시작 간격을 60/rpm 초 이상으로 유지 (모든 스레드 공유)"""
+
+    def __init__(self, rpm):
+        self.interval = 60.0 / rpm if rpm > 0 else 0
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_at)
+            self.next_at = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class DomainRateLimiter:
+    """도메인별로 페이지 요청 사이 최소 간격(+랜덤 지터)을 지키도록 모든 워커가 공유하는 제한기"""
+
+    def __init__(self, min_interval, jitter):
+        self.min_interval = min_interval
+        self.jitter = jitter
+        self.next_allowed = {}
+        self.lock = threading.Lock()
+
+    def wait(self, url):
+        domain = urlparse(url).netloc
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_allowed.get(domain, now))
+            self.next_allowed[domain] = slot + self.min_interval + random.uniform(0, self.jitter)
+        if slot > now:
+            time.sleep(slot - now)
@@ -0,0 +1,224 @@
+"""
+자막 → 조리 과정(JSON 리스트) 추출 단계 (scraper / whisper 공용)
+
+- OpenAI 호출은 common/openai_client.py (클라이언트 재사용, 요청 간격 제한, 재시도)
+- 여러 자막을 스레드 풀로 동시에 요청
+- 결과는 (자막 해시, PROMPT_VERSION, 모델) 기준으로 data/step_cache/ 에 저장해서
+  같은 자막/프롬프트로 다시 요청하면 API를 호출하지 않음
+- 자막이 STEP_CHUNK_TOKENS 보다 길면 잘라내지 않고 조각별로 추출(map)한 뒤 하나로 합침(reduce)
+
+프롬프트를 바꾸면 PROMPT_VERSION을 올려야 기존 캐시를 쓰지 않습니다.
+"""
+import os
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from common import openai_client, telemetry
+from common.steps_json import parse_steps_json, normalize_steps
+from common.transcript_prep import split_by_tokens
+
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(BASE_DIR, 'data', 'step_cache')
+
+STEP_MODEL = os.getenv("STEP_MODEL", "gpt-4o")
+STEP_WORKERS = int(os.getenv("STEP_WORKERS", "4"))   # 동시에 보낼 요청 수
+STEP_CHUNK_TOKENS = int(os.getenv("STEP_CHUNK_TOKENS", "6000"))  # 이보다 긴 자막은 나눠서 추출
+
+PROMPT_VERSION = "v2"
+
+PROMPT_TEMPLATE = """
+너는 요리 레시피를 정리하는 전문 에디터 AI야.
+제공된 [자막]을 분석해서 불필요한 사담(인사, 맛 평가, 광고 등)은 모두 제거하고, 핵심 '요리 과정'만 추출해줘.
+
+[작성 규칙]
+1. 반드시 아래 예시와 같은 **순수 JSON 리스트 포맷**만 출력할 것. (Markdown 코드 블록 사용 금지)
+2. 전체 구조는 객체들의 리스트(`[...]`)여야 한다.
+3. 'step_title'은 해당 단계의 핵심 행동을 10글자 내외로 요약.
+4. 'step_detail'은 구체적인 행동과 재료 손질법, 조리 시간을 포함하여 명확한 문장으로 자세하게 서술.
+5. 재료 손질 과정이 있다면 **반드시 1번 스텝**에 모아서 정리할 것.
+
+[출력 예시]
+[
+    {{"step": 1, "step_title": "재료 손질", "step_detail": "양파는 채 썰고 대파는 송송 썰어 준비합니다."}},
+    {{"step": 2, "step_title": "재료 볶기", "step_detail": "달궈진 팬에 식용유를 두르고 손질한 야채를 중불에서 볶습니다."}},
+    {{"step": 3, "step_title": "양념 하기", "step_detail": "간장 2스푼과 설탕 1스푼을 넣고 골고루 섞어줍니다."}}
+]
+
+---
+[자막]
+{transcript}
+"""
+
+
+# map 단계: 긴 자막의 일부분만 보고 조리 과정 추출
+CHUNK_PROMPT_TEMPLATE = """
+너는 요리 레시피를 정리하는 전문 에디터 AI야.
+아래 [자막]은 긴 요리 영상 자막을 {total}개로 나눈 것 중 {index}번째 부분이야.
+불필요한 사담(인사, 맛 평가, 광고 등)은 모두 제거하고, 이 부분에 나오는 '요리 과정'만 순서대로 추출해줘.
+이 부분에 요리 과정이 없으면 빈 리스트 []를 출력해.
+
+[작성 규칙]
+1. 반드시 순수 JSON 리스트 포맷만 출력할 것. (Markdown 코드 블록 사용 금지)
+2. 각 항목은 {{"step": 번호, "step_title": "...", "step_detail": "..."}} 형태.
+3. 'step_title'은 해당 단계의 핵심 행동을 10글자 내외로 요약.
+4. 'step_detail'은 구체적인 행동과 재료 손질법, 조리 시간을 포함하여 명확한 문장으로 자세하게 서술.
+
+---
+[자막]
+{transcript}
+"""
+
+# reduce 단계: 부분별 결과를 하나의 레시피로 합침
+REDUCE_PROMPT_TEMPLATE = """
+너는 요리 레시피를 정리하는 전문 에디터 AI야.
+아래는 한 요리 영상의 자막을 여러 부분으로 나눠서 각각 추출한 조리 과정 목록이야. (부분 순서대로)
+이것들을 하나의 완성된 조리 과정으로 합쳐줘.
+
+[작성 규칙]
+1. 반드시 순수 JSON 리스트 포맷만 출력할 것. (Markdown 코드 블록 사용 금지)
+2. 부분 경계에서 중복된 단계는 하나로 합치고, 순서는 유지할 것.
+3. 재료 손질 과정이 있다면 **반드시 1번 스텝**에 모아서 정리할 것.
+4. step 번호는 1부터 다시 매길 것.
+5. 각 항목은 {{"step": 번호, "step_title": "...", "step_detail": "..."}} 형태.
+
+---
+[부분별 조리 과정]
+{partials}
+"""
+
+
+def strip_code_fence(content):
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.split("\n", 1)[1] if "\n" in content else ""
+        if content.endswith("```"):
+            content = content.rsplit("\n", 1)[0]
+    return content.strip()
+
+
+class StepExtractor:
+    def __init__(self, model=STEP_MODEL, workers=STEP_WORKERS, cache_dir=CACHE_DIR):
+        self.model = model
+        self.cache_dir = cache_dir
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='steps')
+        self.stats = {'cached': 0, 'requested': 0, 'failed': 0, 'chunked': 0}
+        self._stats_lock = threading.Lock()
+
+    def cache_key(self, transcript):
+        raw = f"{PROMPT_VERSION}\0{self.model}\0{transcript}".encode('utf-8')
+        return hashlib.sha256(raw).hexdigest()
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_cache(self, key):
+        path = self._cache_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)['content']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_cache(self, key, content):
+        path = self._cache_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'prompt_version': PROMPT_VERSION, 'model': self.model, 'content': content}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _complete(self, prompt):
+        """요청 한 번, 코드 블록 제거한 응답 반환"""
+        self._count('requested')
+        content = openai_client.chat([{"role": "user", "content": prompt}], model=self.model, temperature=0)
+        return strip_code_fence(content)
+
+    def _map_reduce(self, chunks):
+        """조각별로 추출한 뒤 합치기. 합치기 응답이 깨지면 조각 결과를 순서대로 이어 붙임"""
+        self._count('chunked')
+        partials = []
+        for i, chunk in enumerate(chunks, 1):
+            content = self._complete(CHUNK_PROMPT_TEMPLATE.format(index=i, total=len(chunks), transcript=chunk))
+            steps, _, _ = parse_steps_json(content)
+            if steps:
+                partials.append(normalize_steps(steps))
+
+        if not partials:
+            return "[]"
+        if len(partials) == 1:
+            return json.dumps(partials[0], ensure_ascii=False)
+
+        partials_text = "\n".join(f"[부분 {i}] {json.dumps(p, ensure_ascii=False)}" for i, p in enumerate(partials, 1))
+        content = self._complete(REDUCE_PROMPT_TEMPLATE.format(partials=partials_text))
+        steps, _, _ = parse_steps_json(content)
+        if steps:
+            return content
+
+        merged = [dict(step, step=i) for i, step in enumerate((s for p in partials for s in p), 1)]
+        return json.dumps(merged, ensure_ascii=False)
+
+    def extract(self, transcript):
+        """자막 하나 → 조리 과정 JSON 문자열 (실패 시 "[]"). 여러 스레드에서 동시에 호출 가능"""
+        if not transcript or len(transcript) < 50:
+            return "[]"
+
+        key = self.cache_key(transcript)
+        cached = self._load_cache(key)
+        if cached is not None:
+            self._count('cached')
+            return cached
+
+        try:
+            with telemetry.stage('llm_steps'):
+                chunks = split_by_tokens(transcript, STEP_CHUNK_TOKENS, self.model)
+                if len(chunks) == 1:
+                    content = self._complete(PROMPT_TEMPLATE.format(transcript=transcript))
+                else:
+                    content = self._map_reduce(chunks)
+        except Exception as e:
+            print(f"      ⚠️ GPT 조리 과정 추출 실패: {e}")
+            self._count('failed')
+            return "[]"
+
+        # 파싱 가능한 결과만 캐시 (실패한 응답은 다음 실행에서 다시 요청)
+        steps, _, _ = parse_steps_json(content)
+        if steps:
+            self._save_cache(key, content)
+        return content
+
+    def submit(self, transcript):
+        """extract를 스레드 풀에 넣고 Future 반환"""
+        return self.pool.submit(self.extract, transcript)
+
+    def extract_many(self, transcripts):
+        """{key: 자막} → {key: 조리 과정 JSON 문자열} (동시 요청)"""
+        futures = {k: self.submit(text) for k, text in transcripts.items()}
+        return {k: f.result() for k, f in futures.items()}
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_extractor():
+    """프로세스 전체에서 공유하는 StepExtractor"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = StepExtractor()
+        return _default
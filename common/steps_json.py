@@ -0,0 +1,104 @@
+import re
+import json
+
+import pandas as pd
+
+FENCE_RE = re.compile(r'```(?:json)?', re.IGNORECASE)
+TRAILING_COMMA_RE = re.compile(r',\s*([\]}])')
+
+_decoder = json.JSONDecoder()
+
+
+def _candidates(raw):
+    """알려진 GPT 출력 오류(코드 블록, 감싼 따옴표, "" 이중 따옴표, 꼬리 쉼표)를 단계별로 고친 후보 문자열들"""
+    text = FENCE_RE.sub('', str(raw)).strip()
+    if text.startswith('"') and text.endswith('"'): text = text[1:-1].strip()
+
+    start = min([i for i in (text.find('['), text.find('{')) if i != -1], default=0)
+    text = text[start:]
+
+    yield text
+    if '""' in text:
+        text = text.replace('""', '"')
+        yield text
+    fixed = TRAILING_COMMA_RE.sub(r'\1', text)
+    if fixed != text:
+        yield fixed
+
+
+def _recover_truncated(text):
+    """잘린 JSON 배열에서 끝까지 완성된 객체들만 앞에서부터 꺼내옴"""
+    if not text.startswith('['):
+        return []
+
+    steps = []
+    pos = 1
+    while pos < len(text):
+        while pos < len(text) and text[pos] in ' \t\r\n,':
+            pos += 1
+        if pos >= len(text) or text[pos] == ']':
+            break
+        try:
+            obj, pos = _decoder.raw_decode(text, pos)
+        except ValueError:
+            break
+        steps.append(obj)
+    return steps
+
+
+def parse_steps_json(raw):
+    """
+    steps_json 문자열을 step 리스트로 파싱.
+    return: (steps, status, detail)
+      status: 'ok' | 'trailing_text'(뒤에 붙은 문구 제거) | 'recovered'(잘린 배열 일부 복구) | 거절 사유
+    """
+    if raw is None or pd.isna(raw):
+        return [], 'missing_steps', ''
+    if str(raw).strip() in ['[]', '']:
+        return [], 'empty_steps', ''
+
+    steps, status, error = None, 'ok', ''
+    last_text = ''
+    for text in _candidates(raw):
+        last_text = text
+        try:
+            steps, end = _decoder.raw_decode(text)
+        except ValueError as e:
+            error = str(e)
+            continue
+        # 배열 뒤에 붙은 설명 문구 등은 버리고 배열만 사용
+        if text[end:].strip():
+            status = 'trailing_text'
+        break
+
+    if steps is None:
+        recovered = _recover_truncated(TRAILING_COMMA_RE.sub(r'\1', last_text))
+        if not recovered:
+            return [], 'invalid_json', error
+        steps, status = recovered, 'recovered'
+
+    if isinstance(steps, dict):
+        steps = steps.get('steps', [steps])
+    if not isinstance(steps, list):
+        return [], 'not_a_list', type(steps).__name__
+
+    steps = [s for s in steps if isinstance(s, dict)]
+    if not steps:
+        return [], 'no_valid_steps', ''
+    return steps, status, error
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def normalize_steps(steps):
+    """step dict들을 {'step', 'step_title', 'step_detail'} 고정 스키마로 정리 (parquet list<struct> 컬럼용)"""
+    return [{
+        'step': _to_int(s.get('step', s.get('step_number', 0))),
+        'step_title': str(s.get('step_title', '') or ''),
+        'step_detail': str(s.get('step_detail', s.get('description', '')) or ''),
+    } for s in steps]
@@ -0,0 +1,163 @@
+"""
+단계(scraper → etl → db 업로드 / rag ingest) 사이에서 주고받는 테이블 입출력.
+
+.env 의 DATA_FORMAT=parquet 이면 CSV 대신 타입이 고정된 Parquet 파일을 쓰고 읽습니다.
+- recipe_video_id / view_count 등은 int64로 저장되어 다시 to_numeric 할 필요가 없음
+- recipes_scraper 의 조리 과정은 JSON 문자열 대신 list<struct> 컬럼(steps)으로 저장
+- 읽을 때는 memory map + 필요한 컬럼만 읽기(column projection)
+
+경로는 항상 기존 .csv 경로 기준으로 넘기면 되고, 확장자는 여기서 바꿉니다.
+"""
+import os
+import sys
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from common.steps_json import parse_steps_json, normalize_steps
+
+load_dotenv()
+
+DATA_FORMAT = os.getenv("DATA_FORMAT", "csv").strip().lower()
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+    if DATA_FORMAT == 'parquet':
+        print("⚠️ pyarrow가 설치되어 있지 않아 CSV 포맷을 사용합니다. (pip install pyarrow)")
+        DATA_FORMAT = 'csv'
+
+if pa is not None:
+    STEP_TYPE = pa.list_(pa.struct([('step', pa.int64()), ('step_title', pa.string()), ('step_detail', pa.string())]))
+
+    SCRAPER_SCHEMA = pa.schema([
+        ('recipe_video_id', pa.int64()),
+        ('video_title', pa.string()),
+        ('video_url', pa.string()),
+        ('thumbnail_url', pa.string()),
+        ('view_count', pa.int64()),
+        ('duration', pa.string()),
+        ('steps', STEP_TYPE),
+        ('steps_status', pa.string()),
+    ])
+
+
+def parquet_path(path):
+    return os.path.splitext(path)[0] + '.parquet'
+
+
+def table_exists(path):
+    return os.path.exists(path) or (pq is not None and os.path.exists(parquet_path(path)))
+
+
+def read_table(path, columns=None):
+    """
+    DATA_FORMAT=parquet 이고 .parquet 파일이 있으면 Parquet을, 아니면 CSV를 읽음.
+    columns를 주면 해당 컬럼만 읽습니다. (Parquet은 파일에서 그 컬럼만 읽음)
+    """
+    pq_path = parquet_path(path)
+    use_parquet = pq is not None and os.path.exists(pq_path) and (DATA_FORMAT == 'parquet' or not os.path.exists(path))
+
+    if use_parquet:
+        if columns is not None:
+            available = pq.read_schema(pq_path).names
+            columns = [c for c in columns if c in available]
+        return pq.read_table(pq_path, columns=columns, memory_map=True).to_pandas()
+
+    df = pd.read_csv(path)
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
+
+
+def write_table(df, path, schema=None):
+    """DATA_FORMAT에 따라 CSV(utf-8-sig) 또는 Parquet으로 저장하고 실제 저장 경로를 반환"""
+    if DATA_FORMAT == 'parquet':
+        pq_path = parquet_path(path)
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        pq.write_table(table, pq_path)
+        return pq_path
+
+    df.to_csv(path, index=False, encoding='utf-8-sig')
+    return path
+
+
+class DedupCsvWriter:
+    """
+    행 단위로 CSV에 append 하되, 이미 있는 key(recipe_video_id)가 다시 들어오면
+    기존 행을 교체해서 파일에 같은 영상이 두 번 들어가지 않도록 함.
+    (새 영상은 append, 재시도로 다시 처리한 영상만 파일을 다시 씀)
+    """
+
+    def __init__(self, path, key='recipe_video_id'):
+        self.path = path
+        self.key = key
+        self.keys = set()
+        if os.path.exists(path):
+            df = pd.read_csv(path)
+            if key in df.columns:
+                deduped = df.drop_duplicates(subset=[key], keep='last')
+                # 기존 실행에서 중복으로 쌓인 행도 한 번 정리
+                if len(deduped) != len(df):
+                    deduped.to_csv(path, index=False, encoding='utf-8-sig')
+                self.keys = set(deduped[key].map(self._norm))
+
+    @staticmethod
+    def _norm(value):
+        try:
+            return str(int(float(value)))
+        except (TypeError, ValueError):
+            return str(value)
+
+    def write(self, row):
+        key = self._norm(row.get(self.key))
+        df_save = pd.DataFrame([row])
+
+        if not os.path.exists(self.path):
+            df_save.to_csv(self.path, index=False, mode='w', encoding='utf-8-sig')
+        elif key not in self.keys:
+            df_save.to_csv(self.path, index=False, mode='a', header=False, encoding='utf-8-sig')
+        else:
+            df = pd.read_csv(self.path)
+            df = df[df[self.key].map(self._norm) != key]
+            pd.concat([df, df_save], ignore_index=True).to_csv(self.path, index=False, encoding='utf-8-sig')
+        self.keys.add(key)
+
+
+def write_scraper_parquet(csv_path):
+    """
+    행 단위로 append 된 recipes_scraper.csv 를 Parquet 스냅샷으로 변환.
+    steps_json 문자열은 여기서 한 번만 파싱해서 steps(list<struct>) 컬럼과 steps_status로 저장합니다.
+    """
+    df = pd.read_csv(csv_path)
+    df['recipe_video_id'] = pd.to_numeric(df['recipe_video_id'], errors='coerce')
+    df = df.dropna(subset=['recipe_video_id']).drop_duplicates(subset=['recipe_video_id'], keep='last')
+    df['recipe_video_id'] = df['recipe_video_id'].astype('int64')
+    df['view_count'] = pd.to_numeric(df['view_count'], errors='coerce').fillna(0).astype('int64')
+    for col in ['video_title', 'video_url', 'thumbnail_url', 'duration']:
+        df[col] = df[col].astype('string')
+
+    parsed = [parse_steps_json(raw) for raw in df['steps_json']]
+    df['steps'] = [normalize_steps(steps) for steps, _, _ in parsed]
+    df['steps_status'] = [status for _, status, _ in parsed]
+
+    df = df[SCRAPER_SCHEMA.names]
+    pq.write_table(pa.Table.from_pandas(df, schema=SCRAPER_SCHEMA, preserve_index=False), parquet_path(csv_path))
+    return parquet_path(csv_path)
+
+
+if __name__ == "__main__":
+    # 기존 CSV를 Parquet으로 변환: python -m common.table_io data/recipes_data.csv data/recipes_scraper.csv
+    if pq is None:
+        print("❌ pyarrow가 필요합니다. (pip install pyarrow)")
+        sys.exit(1)
+
+    for csv_path in sys.argv[1:]:
+        if os.path.basename(csv_path).startswith('recipes_scraper'):
+            out = write_scraper_parquet(csv_path)
+        else:
+            out = parquet_path(csv_path)
+            pq.write_table(pa.Table.from_pandas(pd.read_csv(csv_path), preserve_index=False), out)
+        print(f"✅ {csv_path} → {out}")
@@ -0,0 +1,200 @@
+"""
+실행 계측 (scraper / whisper / etl / rag ingest 공용)
+
+    run = telemetry.start_run('scraper', total=len(rows))
+    with telemetry.stage('transcript'):
+        ...
+    telemetry.tick(ok=True)                     # 영상/레시피 하나 처리 완료
+    telemetry.note('transcript_tiers', chain.summary())
+    telemetry.finish()                          # data/reports/scraper-YYYYmmdd-HHMMSS.json
+
+- stage: 단계별 횟수 / 누적 시간 (여러 스레드에서 동시에 돌면 시간은 합산됨 → 병목 단계 비교용)
+- tick: 처리 건수 → 분당 처리량, 남은 시간 추정 (TELEMETRY_INTERVAL 초마다 진행 상황 출력)
+- OpenAI 모델별 호출 수 / 토큰 / 오디오 길이는 common/openai_client 집계를 그대로 가져와 비용 추정
+실행 중인 run 이 없으면 stage / tick / note 는 아무 것도 하지 않습니다.
+"""
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+from common import openai_client
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORT_DIR = os.getenv("TELEMETRY_DIR", os.path.join(BASE_DIR, 'data', 'reports'))
+TELEMETRY_INTERVAL = float(os.getenv("TELEMETRY_INTERVAL", "30"))   # 진행 상황 출력 간격(초), 0이면 끔
+
+# 모델별 단가 (USD): 토큰은 100만 토큰당 (입력, 출력), whisper 는 분당
+TOKEN_PRICES = {
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4o-mini': (0.15, 0.60),
+    'text-embedding-3-small': (0.02, 0.0),
+    'text-embedding-3-large': (0.13, 0.0),
+}
+AUDIO_PRICES = {
+    'whisper-1': 0.006,
+}
+
+
+def estimate_cost(usage):
+    """openai_client.usage_summary() → {모델: USD} (단가를 모르는 모델은 제외, 재생된 호출은 실제로 과금되지 않았어도 포함)"""
+    costs = {}
+    for model, u in usage.items():
+        if model in TOKEN_PRICES:
+            price_in, price_out = TOKEN_PRICES[model]
+            costs[model] = (u['prompt_tokens'] * price_in + u['completion_tokens'] * price_out) / 1_000_000
+        elif model in AUDIO_PRICES:
+            costs[model] = u['audio_seconds'] / 60 * AUDIO_PRICES[model]
+    return {model: round(cost, 4) for model, cost in costs.items()}
+
+
+class Run:
+    def __init__(self, name, total=None, interval=TELEMETRY_INTERVAL):
+        self.name = name
+        self.total = total
+        self.started_at = datetime.now()
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.items = {'ok': 0, 'failed': 0}
+        self.notes = {}
+
+        self._stop = threading.Event()
+        self._progress = None
+        if interval > 0:
+            self._progress = threading.Thread(target=self._progress_loop, args=(interval,), daemon=True)
+            self._progress.start()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.monotonic()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            elapsed = time.monotonic() - started
+            with self.lock:
+                s = self.stages.setdefault(name, {'count': 0, 'failed': 0, 'seconds': 0.0})
+                s['count'] += 1
+                s['seconds'] += elapsed
+                if not ok:
+                    s['failed'] += 1
+
+    def tick(self, ok=True, n=1):
+        with self.lock:
+            self.items['ok' if ok else 'failed'] += n
+
+    def note(self, key, value):
+        with self.lock:
+            self.notes[key] = value
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.started
+        with self.lock:
+            done = self.items['ok'] + self.items['failed']
+            stages = {k: dict(v, seconds=round(v['seconds'], 2), avg_seconds=round(v['seconds'] / v['count'], 3) if v['count'] else 0)
+                      for k, v in self.stages.items()}
+            items = dict(self.items, done=done, total=self.total)
+            notes = dict(self.notes)
+
+        usage = openai_client.usage_summary()
+        costs = estimate_cost(usage)
+        total_cost = round(sum(costs.values()), 4)
+        per_minute = done / elapsed * 60 if elapsed > 0 else 0.0
+        remaining = (self.total - done) / per_minute * 60 if self.total and per_minute > 0 else None
+
+        return {
+            'name': self.name,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'elapsed_seconds': round(elapsed, 2),
+            'items': items,
+            'items_per_minute': round(per_minute, 2),
+            'eta_seconds': round(remaining, 1) if remaining is not None else None,
+            'stages': stages,
+            'openai': usage,
+            'estimated_cost_usd': costs,
+            'total_cost_usd': total_cost,
+            'cost_per_item_usd': round(total_cost / done, 5) if done else None,
+            'notes': notes,
+        }
+
+    def progress_line(self):
+        snap = self.snapshot()
+        items = snap['items']
+        total = f"/{items['total']}" if items['total'] else ""
+        eta = f" | 남은 시간 ~{snap['eta_seconds'] / 60:.1f}분" if snap['eta_seconds'] is not None else ""
+        slowest = max(snap['stages'].items(), key=lambda kv: kv[1]['seconds'], default=None)
+        bottleneck = f" | 최장 단계 {slowest[0]}({slowest[1]['seconds']:.0f}초)" if slowest else ""
+        return (f"⏱️ [{self.name}] {items['done']}{total}개 (실패 {items['failed']}) | {snap['items_per_minute']:.1f}개/분"
+                f"{eta}{bottleneck} | 비용 ~${snap['total_cost_usd']:.2f}")
+
+    def _progress_loop(self, interval):
+        last_done = None
+        while not self._stop.wait(interval):
+            with self.lock:
+                done = self.items['ok'] + self.items['failed']
+            if done != last_done:
+                print(self.progress_line())
+                last_done = done
+
+    def finish(self, status='ok'):
+        """진행 출력 중지, 요약 출력, JSON 리포트 저장 후 경로 반환"""
+        self._stop.set()
+        report = self.snapshot()
+        report['status'] = status
+        report['finished_at'] = datetime.now().isoformat(timespec='seconds')
+
+        print(self.progress_line())
+        for name, s in sorted(report['stages'].items(), key=lambda kv: -kv[1]['seconds']):
+            print(f"   ⏱️ {name}: {s['count']}회 / {s['seconds']}초 (평균 {s['avg_seconds']}초, 실패 {s['failed']}회)")
+
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        path = os.path.join(REPORT_DIR, f"{self.name}-{self.started_at:%Y%m%d-%H%M%S}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"📈 실행 리포트 저장: {path}")
+        return path
+
+
+_current = None
+
+
+def start_run(name, total=None, interval=TELEMETRY_INTERVAL):
+    global _current
+    _current = Run(name, total=total, interval=interval)
+    return _current
+
+
+def current():
+    return _current
+
+
+def stage(name):
+    return _current.stage(name) if _current else nullcontext()
+
+
+def tick(ok=True, n=1):
+    if _current:
+        _current.tick(ok, n)
+
+
+def note(key, value):
+    if _current:
+        _current.note(key, value)
+
+
+def set_total(total):
+    if _current:
+        _current.total = total
+
+
+def finish(status='ok'):
+    global _current
+    if _current is None:
+        return None
+    path = _current.finish(status)
+    _current = None
+    return path
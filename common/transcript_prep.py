@@ -0,0 +1,146 @@
+"""
+GPT에 넘기기 전 자막 정리 + 토큰 수 계산 + 긴 자막 분할
+
+- 자동 생성 자막은 앞 줄 끝부분이 다음 줄 앞에 그대로 반복되는 경우가 많아서 겹치는 부분을 제거
+  (자막 API / yt-dlp 자막에만 적용. Whisper / 브라우저 스크립트는 줄이 겹치지 않으므로 그대로 둠)
+- [음악], (웃음), [00:12] 같은 태그/타임스탬프와 '음', '어' 같은 추임새 제거
+- tiktoken 이 있으면 정확한 토큰 수, 없으면 글자 수 기반 추정치 사용
+- 긴 자막은 토큰 기준으로 문장 경계에서 나눔 (step_extractor 의 map-reduce 용)
+"""
+import re
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# [음악], [박수], [00:12] / (웃음) — 괄호는 분량 표기 "(2큰술)" 등이 있어서 알려진 태그만 제거
+TAG_RE = re.compile(r"\[[^\]]{0,20}\]|\((?:웃음|박수|음악|music|applause|laughter)\)", re.IGNORECASE)
+# 줄 맨 앞의 타임스탬프만 제거 (문장 중간의 "1:10 비율", "5:30" 같은 내용은 유지, [00:12] 는 TAG_RE 에서 처리)
+TIMESTAMP_RE = re.compile(r"^[ \t]*\d{1,2}:\d{2}(?::\d{2})?(?!\d)[ \t]*[-–]?", re.MULTILINE)
+FILLER_RE = re.compile(r"(?<!\S)(?:음+|어+|아+|으+|흠+|um+|uh+|hmm+)[.,!?~]*(?!\S)", re.IGNORECASE)
+REPEAT_PUNCT_RE = re.compile(r"([.,!?~])\1+")
+SPACE_RE = re.compile(r"\s+")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+|(?<=[다요죠네까])\s+")
+
+MAX_OVERLAP_WORDS = 30
+# 이보다 적게 겹치면 우연히 같은 단어로 보고 지우지 않음 ("물을 넣고" / "넣고 싶은 만큼")
+MIN_OVERLAP_WORDS = 2
+# 겹침 제거를 적용할 자막 단계 (common/transcripts.py 의 단계 이름)
+ROLLING_TIERS = ('transcript_api', 'ytdlp')
+
+_encoders = {}
+
+
+def _encoder(model):
+    if tiktoken is None:
+        return None
+    if model not in _encoders:
+        try:
+            _encoders[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encoders[model] = tiktoken.get_encoding("o200k_base")
+    return _encoders[model]
+
+
+def count_tokens(text, model="gpt-4o"):
+    """토큰 수 (tiktoken 없으면 한글 1글자≈1토큰, 그 외 4글자≈1토큰으로 추정)"""
+    if not text:
+        return 0
+    enc = _encoder(model)
+    if enc is not None:
+        return len(enc.encode(text))
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+
+def clean_text(text):
+    """태그/타임스탬프/추임새 제거, 공백 정리"""
+    text = TAG_RE.sub(" ", text)
+    text = TIMESTAMP_RE.sub(" ", text)
+    text = FILLER_RE.sub(" ", text)
+    text = REPEAT_PUNCT_RE.sub(r"\1", text)
+    return SPACE_RE.sub(" ", text).strip()
+
+
+def dedupe_segments(segments, min_overlap=MIN_OVERLAP_WORDS):
+    """
+    연속된 자막 조각 사이의 겹침 제거.
+    이전까지 이어 붙인 단어들의 끝과 이번 조각의 앞이 min_overlap 단어 이상 같으면 그 부분을 잘라냅니다.
+    (조각 전체가 그대로 반복되는 경우는 짧아도 걸러짐)
+    """
+    result = []
+    tail = []  # 지금까지 남긴 단어들 중 마지막 MAX_OVERLAP_WORDS 개
+    for seg in segments:
+        words = (seg.get('text') or "").replace("\n", " ").split()
+        if not words:
+            continue
+
+        overlap = 0
+        for n in range(min(len(words), len(tail)), 0, -1):
+            if tail[-n:] == words[:n]:
+                if n >= min_overlap or n == len(words):
+                    overlap = n
+                break
+
+        rest = words[overlap:]
+        if not rest:
+            continue
+        result.append({'start': seg.get('start'), 'text': " ".join(rest)})
+        tail = (tail + rest)[-MAX_OVERLAP_WORDS:]
+    return result
+
+
+def _segments(segments, dedupe):
+    return dedupe_segments(segments) if dedupe else [seg for seg in segments if (seg.get('text') or "").strip()]
+
+
+def compact_segments(segments, dedupe=True):
+    """
+    segments → GPT 입력용으로 정리된 텍스트 (타임스탬프 없음)
+    dedupe: 자동 생성 자막처럼 줄이 겹치는 경우만 True (tier in ROLLING_TIERS)
+    """
+    texts = (clean_text(seg['text']) for seg in _segments(segments, dedupe))
+    return " ".join(t for t in texts if t)
+
+
+def format_with_timestamps(segments, dedupe=True):
+    """타임스탬프가 필요한 경우([MM:SS] 텍스트): 겹침/추임새만 정리"""
+    parts = []
+    for seg in _segments(segments, dedupe):
+        text = clean_text(seg['text'])
+        if not text:
+            continue
+        start = seg.get('start') or 0.0
+        parts.append(f"[{int(start // 60):02d}:{int(start % 60):02d}] {text}")
+    return " ".join(parts)
+
+
+def split_by_tokens(text, max_tokens, model="gpt-4o"):
+    """문장 경계 기준으로 max_tokens 이하 조각들로 분할 (한 문장이 너무 길면 글자 기준으로 자름)"""
+    if count_tokens(text, model) <= max_tokens:
+        return [text]
+
+    chunks, current, current_tokens = [], [], 0
+    for sentence in SENTENCE_END_RE.split(text):
+        if not sentence:
+            continue
+        tokens = count_tokens(sentence, model)
+        if tokens > max_tokens:
+            # 문장 하나가 한도를 넘으면 비율로 잘라서 처리
+            step = max(1, len(sentence) * max_tokens // tokens)
+            pieces = [sentence[i:i + step] for i in range(0, len(sentence), step)]
+        else:
+            pieces = [sentence]
+
+        for piece in pieces:
+            piece_tokens = count_tokens(piece, model)
+            if current and current_tokens + piece_tokens > max_tokens:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
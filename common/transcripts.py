@@ -0,0 +1,164 @@
+"""
+자막 확보 단계 (여러 방법을 싼 순서대로 시도)
+
+1. transcript_api : youtube-transcript-api (HTTP 요청 몇 번)
+2. ytdlp          : yt-dlp 가 찾아준 자막(JSON3) 다운로드
+3. browser        : Selenium 으로 '스크립트 표시' 클릭 (scraper 에서 추가)
+4. whisper        : 오디오 다운로드 후 Whisper 변환 (whisper 에서 추가)
+
+앞 단계에서 자막을 얻으면 뒤 단계(브라우저/오디오)는 실행하지 않습니다.
+각 단계는 segments([{'start': 초 or None, 'text': str}, ...]) 또는 None 을 반환하고,
+TranscriptChain.fetch 는 (segments, 성공한 단계 이름)을 돌려줍니다.
+"""
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+
+try:
+    from youtube_transcript_api import YouTubeTranscriptApi
+except ImportError:
+    YouTubeTranscriptApi = None
+
+try:
+    import yt_dlp
+except ImportError:
+    yt_dlp = None
+
+LANGUAGES = ['ko', 'en']   # 한국어 우선, 없으면 영어
+MIN_CHARS = 50             # 이보다 짧으면 자막이 없는 것으로 봄
+
+
+def segments_to_text(segments):
+    return " ".join(seg['text'].replace("\n", " ").strip() for seg in segments if seg.get('text')).strip()
+
+
+# YouTubeTranscriptApi 는 내부에 requests 세션을 들고 있어서 스레드마다 하나씩 만들어 재사용
+_local = threading.local()
+
+
+def _transcript_api():
+    if not hasattr(_local, 'api'):
+        _local.api = YouTubeTranscriptApi()
+    return _local.api
+
+
+def fetch_transcript_api(video_id, video_url=None):
+    """youtube-transcript-api 로 자막 조회"""
+    if YouTubeTranscriptApi is None or not video_id:
+        return None
+
+    transcript_obj = _transcript_api().fetch(video_id, languages=LANGUAGES)
+    # 객체인 경우 .to_raw_data()로 딕셔너리 리스트 변환
+    raw = transcript_obj.to_raw_data() if hasattr(transcript_obj, 'to_raw_data') else transcript_obj
+
+    segments = []
+    for t in raw:
+        if isinstance(t, dict):
+            text, start = t.get('text', ''), t.get('start', 0.0)
+        else:
+            text, start = getattr(t, 'text', ''), getattr(t, 'start', 0.0)
+        segments.append({'start': float(start), 'text': text})
+    return segments
+
+
+def parse_json3(data):
+    """유튜브 자막 JSON3 포맷 → segments"""
+    segments = []
+    for event in data.get('events', []):
+        if 'segs' not in event:
+            continue
+        text = "".join(seg.get('utf8', '') for seg in event['segs'])
+        if text.strip():
+            segments.append({'start': event.get('tStartMs', 0) / 1000.0, 'text': text})
+    return segments
+
+
+def json3_url(url):
+    """자막 URL 의 fmt 파라미터를 json3 로 교체 (yt-dlp 기본값은 fmt=vtt 같은 다른 포맷일 수 있음)"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != 'fmt']
+    query.append(('fmt', 'json3'))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def fetch_ytdlp_subtitles(video_id, video_url=None, info=None):
+    """
+    yt-dlp 로 자막(수동 → 자동 생성) URL을 찾아 JSON3 로 다운로드.
+    info 를 넘기면(이미 extract_info 한 결과) 다시 조회하지 않습니다.
+    """
+    if info is None:
+        if yt_dlp is None or not video_url:
+            return None
+        ydl_opts = {
+            'skip_download': True,
+            'writesubtitles': True,
+            'writeautomaticsub': True,
+            'subtitleslangs': LANGUAGES,
+            'subtitlesformat': 'json3',
+            'quiet': True,
+            'no_warnings': True,
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(video_url, download=False)
+
+    captions = info.get('requested_subtitles') or {}
+    for lang in LANGUAGES:
+        sub = captions.get(lang) or {}
+        if not sub.get('url'):
+            continue
+        url = json3_url(sub['url'])
+        res = requests.get(url, timeout=15)
+        res.raise_for_status()
+        segments = parse_json3(res.json())
+        if segments:
+            return segments
+    return None
+
+
+class TranscriptChain:
+    """
+    tiers: [(이름, fn(video_id, video_url) -> segments or None), ...]
+    limiter: 주면 각 단계 요청 전에 limiter.wait(video_url) (같은 도메인 요청 간격 유지)
+    reraise: 다음 단계로 넘어가지 않고 그대로 올릴 예외 타입 (브라우저가 죽은 경우 등)
+    """
+
+    def __init__(self, tiers, limiter=None, reraise=()):
+        self.tiers = tiers
+        self.limiter = limiter
+        self.reraise = tuple(reraise)
+        self.counts = {name: {'ok': 0, 'failed': 0} for name, _ in tiers}
+        self.lock = threading.Lock()
+
+    def _count(self, name, ok):
+        with self.lock:
+            self.counts[name]['ok' if ok else 'failed'] += 1
+
+    def fetch(self, video_id, video_url):
+        for name, fn in self.tiers:
+            try:
+                if self.limiter and video_url:
+                    self.limiter.wait(video_url)
+                segments = fn(video_id, video_url)
+            except self.reraise:
+                raise
+            except Exception as e:
+                print(f"   ⚠️ 자막({name}) 실패: {type(e).__name__}: {str(e)[:200]}")
+                segments = None
+
+            ok = bool(segments) and len(segments_to_text(segments)) >= MIN_CHARS
+            self._count(name, ok)
+            if ok:
+                return segments, name
+        return None, None
+
+    def summary(self):
+        return {name: dict(c) for name, c in self.counts.items()}
+
+
+def cheap_tiers():
+    """브라우저/오디오 없이 가능한 단계들"""
+    return [
+        ('transcript_api', fetch_transcript_api),
+        ('ytdlp', fetch_ytdlp_subtitles),
+    ]
@@ -1,7 +1,17 @@
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text, bindparam
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import os
+import time
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_EXCEPTION, wait
 from dotenv import load_dotenv
+from common.table_io import read_table, table_exists
 
 load_dotenv()
 
@@ -11,84 +21,415 @@ DB_HOST = os.getenv("DB_HOST")
 DB_PORT = os.getenv("DB_PORT")
 DB_NAME = os.getenv("DB_NAME")
 
-try:
-    db_connection_str = f'mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
-    db_connection = create_engine(db_connection_str)
-    print(f"✅ DB 연결 성공: {DB_NAME}")
-except Exception as e:
-    print(f"❌ DB 연결 실패: {e}")
-    exit()
+# 로컬 테스트용: DB_URL=sqlite:///local.db 처럼 지정하면 MySQL 대신 사용
+DB_URL = os.getenv("DB_URL") or f'mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
 
-def upload_csv(file_name, table_name, mapping=None):
-    """CSV 파일을 읽어서 DB 테이블에 넣는 함수"""
-    file_path = f'etl/{file_name}' 
-    
+# 한 번의 INSERT 문에 넣을 행 수
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", "1000"))
 
+# 동시에 적재할 커넥션(워커) 수 (--workers 로 바꾸면 커넥션 풀 크기도 같이 맞춤)
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
 
-    if not os.path.exists(file_path):
-        if os.path.exists(file_name):
+# 이 행 수보다 큰 테이블은 여러 워커가 나눠서 적재
+PARALLEL_CHUNK_ROWS = int(os.getenv("UPLOAD_PARALLEL_CHUNK_ROWS", "20000"))
+
+# upsert(중복 시 갱신)에 사용하는 테이블별 키 컬럼 (DB에 PK/UNIQUE로 잡혀 있어야 함)
+TABLE_KEYS = {
+    'category': ['category_id'],
+    'recipe_video': ['recipe_video_id'],
+    'items': ['item_id'],
+    'recipe_items': ['recipe_video_id', 'item_id'],
+    'recipe_steps': ['recipe_video_id', 'step_number'],
+}
+
+def create_db_engine(workers=UPLOAD_WORKERS):
+    """
+    워커마다 커넥션 하나를 업로드가 끝날 때까지 잡고 있으므로 풀 크기를 워커 수에 맞춤.
+    SQLite는 워커 1개로 적재하지만 커밋/정리는 메인 스레드에서 하므로 스레드 검사를 끄고,
+    메모리 DB(sqlite://)는 모든 스레드가 같은 커넥션을 쓰도록 StaticPool 사용.
+    """
+    url = make_url(DB_URL)
+    kwargs = {'pool_pre_ping': True}
+    if url.get_backend_name() == 'sqlite':
+        kwargs['connect_args'] = {'check_same_thread': False}
+        if url.database in (None, '', ':memory:'):
+            kwargs['poolclass'] = StaticPool
+    else:
+        kwargs.update(pool_size=max(1, workers), max_overflow=0)
+    if url.get_backend_name() == 'mysql':
+        kwargs['connect_args'] = {'local_infile': True}
+    return create_engine(url, **kwargs)
+
+def make_insert_method(table_name, mode):
+    """
+    pandas to_sql(method=...)에 넘길 함수.
+    chunk 하나(CHUNK_SIZE 행)를 multi-row INSERT 한 번으로 보내고,
+    mode='upsert'면 MySQL은 ON DUPLICATE KEY UPDATE, SQLite는 ON CONFLICT DO UPDATE로 보냅니다.
+    """
+    key_cols = TABLE_KEYS.get(table_name, [])
+
+    def insert_chunk(table, conn, keys, data_iter):
+        rows = [dict(zip(keys, row)) for row in data_iter]
+        dialect = conn.dialect.name
+
+        if mode == 'append' or not key_cols:
+            stmt = table.table.insert().values(rows)
+        elif dialect == 'mysql':
+            stmt = mysql_insert(table.table).values(rows)
+            update_cols = [c for c in keys if c not in key_cols] or key_cols[:1]
+            stmt = stmt.on_duplicate_key_update({c: stmt.inserted[c] for c in update_cols})
+        elif dialect == 'sqlite':
+            stmt = sqlite_insert(table.table).values(rows)
+            update_cols = [c for c in keys if c not in key_cols]
+            if update_cols:
+                stmt = stmt.on_conflict_do_update(index_elements=key_cols, set_={c: stmt.excluded[c] for c in update_cols})
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=key_cols)
+        else:
+            stmt = table.table.insert().values(rows)
+
+        return conn.execute(stmt).rowcount
+
+    return insert_chunk
+
+def ensure_table(conn, df, table_name):
+    """(SQLite 로컬 테스트용) 테이블이 없으면 upsert 키를 PK로 잡아서 생성"""
+    if conn.dialect.name != 'sqlite' or inspect(conn).has_table(table_name):
+        return
+    schema = pd.io.sql.get_schema(df, table_name, keys=TABLE_KEYS.get(table_name), con=conn)
+    conn.exec_driver_sql(schema)
+
+def load_data_infile(conn, df, table_name):
+    """
+    MySQL LOAD DATA LOCAL INFILE로 임시 테이블에 적재한 뒤
+    INSERT ... SELECT ... ON DUPLICATE KEY UPDATE로 본 테이블에 반영
+    """
+    cols = list(df.columns)
+    col_list = ", ".join(f"`{c}`" for c in cols)
+    key_cols = TABLE_KEYS.get(table_name, [])
+    update_cols = [c for c in cols if c not in key_cols] or key_cols[:1] or cols[:1]
+    updates = ", ".join(f"`{c}` = VALUES(`{c}`)" for c in update_cols)
+    staging = f"_staging_{table_name}"
+
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8', newline='') as f:
+        df.to_csv(f, index=False, header=False, na_rep='NULL')
+        tmp_path = f.name
+
+    try:
+        conn.exec_driver_sql(f"DROP TEMPORARY TABLE IF EXISTS `{staging}`")
+        conn.exec_driver_sql(f"CREATE TEMPORARY TABLE `{staging}` LIKE `{table_name}`")
+        conn.exec_driver_sql(
+            f"LOAD DATA LOCAL INFILE '{tmp_path}' INTO TABLE `{staging}` CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+            f"LINES TERMINATED BY '\\n' ({col_list})"
+        )
+        result = conn.exec_driver_sql(
+            f"INSERT INTO `{table_name}` ({col_list}) SELECT {col_list} FROM `{staging}` "
+            f"ON DUPLICATE KEY UPDATE {updates}"
+        )
+        conn.exec_driver_sql(f"DROP TEMPORARY TABLE `{staging}`")
+        return result.rowcount
+    finally:
+        os.remove(tmp_path)
+
+def read_upload(file_name, table_name, mapping=None, mode='upsert'):
+    """업로드할 파일을 읽어서 DataFrame으로 반환 (파일이 없으면 None)"""
+    file_path = f'etl/{file_name}'
+
+    if not table_exists(file_path):
+        if table_exists(file_name):
             file_path = file_name
         else:
             print(f"⚠️ 파일 없음: {file_path} (건너뜀)")
-            return
+            return None
 
-    print(f"\n📂 '{file_path}' 읽는 중...")
-    try:
-        df = pd.read_csv(file_path)
-    except Exception as e:
-        print(f"❌ CSV 읽기 실패: {e}")
-        return
+    print(f"📂 '{file_path}' 읽는 중...")
+    df = read_table(file_path)
 
     if mapping:
         df = df.rename(columns=mapping)
 
+    # 같은 키가 파일 안에 여러 번 있으면 마지막 값만 사용 (한 INSERT 안에서 충돌 방지)
+    key_cols = TABLE_KEYS.get(table_name)
+    if mode != 'append' and key_cols and all(c in df.columns for c in key_cols):
+        df = df.drop_duplicates(subset=key_cols, keep='last')
+    return df
+
+def load_frame(conn, df, table_name, mode='upsert'):
+    """
+    DataFrame 하나를 열려 있는 트랜잭션(conn)에 적재.
+      mode='append' : 기존처럼 INSERT만 (재실행 시 중복 키 에러 가능)
+      mode='upsert' : 키가 겹치면 갱신 → 여러 번 올려도 결과가 같음
+      mode='infile' : MySQL LOAD DATA LOCAL INFILE + upsert (MySQL이 아니면 upsert로 대체)
+    """
+    if mode == 'infile' and conn.dialect.name == 'mysql':
+        load_data_infile(conn, df, table_name)
+    else:
+        ensure_table(conn, df, table_name)
+        df.to_sql(name=table_name, con=conn, if_exists='append', index=False,
+                  chunksize=CHUNK_SIZE, method=make_insert_method(table_name, mode))
+
+def delete_children(conn, table_name, key, ids):
+    """
+    (--delta) 변경된 레시피의 기존 자식 행 삭제.
+    변경분 파일에는 새 행만 있으므로, 지우지 않으면 줄어든 조리 단계/빠진 재료가 DB에 그대로 남음
+    """
+    if not ids or not inspect(conn).has_table(table_name):
+        return 0
+    stmt = text(f"DELETE FROM {table_name} WHERE {key} IN :ids").bindparams(bindparam('ids', expanding=True))
+    deleted = 0
+    for i in range(0, len(ids), CHUNK_SIZE):
+        deleted += conn.execute(stmt, {'ids': ids[i:i + CHUNK_SIZE]}).rowcount
+    return deleted
+
+def upload_levels(plan):
+    """FK 의존관계(deps)로 위상 정렬해서 동시에 올려도 되는 테이블끼리 묶은 단계 리스트"""
+    remaining = {spec['table']: spec for spec in plan}
+    levels = []
+    while remaining:
+        level = [t for t, spec in remaining.items() if not any(d in remaining for d in spec['deps'])]
+        if not level:
+            raise ValueError(f"FK 의존관계에 순환이 있습니다: {list(remaining)}")
+        levels.append(level)
+        for t in level:
+            del remaining[t]
+    return levels
+
+class UploadRun:
+    """
+    워커 스레드마다 커넥션 하나를 열어 두고, FK 단계(level)마다 트랜잭션을 새로 시작.
+    FK 검사는 켜 둔 채로 적재하므로 자식 테이블은 부모 단계가 커밋된 뒤에 올립니다.
+    한 단계에서 하나라도 실패하면 남은 작업을 취소하고 그 단계의 트랜잭션을 모두 롤백합니다.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.connections = []
+        self.transactions = []
+        self.abort = threading.Event()
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self.engine.connect()
+            with self.lock:
+                self.connections.append(conn)
+        if not conn.in_transaction():
+            self.local.trans = conn.begin()
+            self.local.tables = set()
+            with self.lock:
+                self.transactions.append((self.local.trans, self.local.tables))
+        return conn
+
+    def load_chunk(self, df, table_name, mode):
+        if self.abort.is_set():
+            raise RuntimeError("다른 테이블 실패로 취소됨")
+        start = time.perf_counter()
+        conn = self.connection()
+        self.local.tables.add(table_name)
+        load_frame(conn, df, table_name, mode)
+        return start, time.perf_counter()
+
+    def replace_chunk(self, df, table_name, mode, key, ids):
+        """기존 자식 행 삭제 + 새 행 적재를 한 트랜잭션에서 (조각으로 나누지 않음)"""
+        if self.abort.is_set():
+            raise RuntimeError("다른 테이블 실패로 취소됨")
+        start = time.perf_counter()
+        conn = self.connection()
+        self.local.tables.add(table_name)
+        deleted = delete_children(conn, table_name, key, ids)
+        print(f"🧹 '{table_name}' 변경된 레시피 {len(ids)}개의 기존 행 {deleted}개 삭제")
+        if len(df):
+            load_frame(conn, df, table_name, mode)
+        return start, time.perf_counter()
+
+    def end_level(self, success):
+        """
+        이번 단계에서 열린 트랜잭션을 모두 커밋(또는 롤백).
+        트랜잭션마다 따로 커밋하므로 중간에 커밋이 실패하면 나머지는 롤백하고,
+        return: (모든 조각이 커밋된 테이블, 일부 조각만 커밋된 테이블, 커밋 에러 or None)
+        """
+        committed, rolled_back, error = set(), set(), None
+        for trans, tables in self.transactions:
+            if success and error is None:
+                try:
+                    trans.commit()
+                    committed |= tables
+                    continue
+                except Exception as e:
+                    error = e
+            trans.rollback()
+            rolled_back |= tables
+        self.transactions = []
+        return committed - rolled_back, committed & rolled_back, error
+
+    def close(self):
+        for trans, _ in self.transactions:
+            trans.rollback()
+        self.transactions = []
+        for conn in self.connections:
+            conn.close()
+
+def upload_all(plan, mode='upsert', workers=UPLOAD_WORKERS, engine=None, replace_ids=None):
+    """
+    plan의 테이블들을 FK 그래프 순서대로, 같은 단계의 테이블은 동시에 적재.
+    큰 테이블은 PARALLEL_CHUNK_ROWS 행씩 나눠서 여러 워커가 나눠 올립니다.
+    replace_ids(변경된 recipe_video_id 목록)를 주면 plan 에 replace_key 가 있는 테이블은
+    해당 레시피의 기존 행을 지우고 다시 적재합니다. (변경분 파일이 비어 있어도 삭제는 수행)
+    """
+    engine = engine or create_db_engine(workers)
+    # SQLite는 쓰기 커넥션이 하나뿐이므로 워커 1개(= 트랜잭션 1개)로 순차 적재
+    if engine.dialect.name == 'sqlite':
+        workers = 1
+
+    frames = {}
+    for spec in plan:
+        try:
+            df = read_upload(spec['file'], spec['table'], spec.get('mapping'), mode)
+        except Exception as e:
+            print(f"❌ 파일 읽기 실패 ({spec['file']}): {e}")
+            return False
+        if df is None and replace_ids and spec.get('replace_key'):
+            df = pd.DataFrame(columns=list((spec.get('mapping') or {}).values()))
+        if df is not None:
+            frames[spec['table']] = df
+    replace_keys = {spec['table']: spec['replace_key'] for spec in plan if spec.get('replace_key')} if replace_ids else {}
+
+    run = UploadRun(engine)
+    timings = {}
+    committed = []   # 커밋까지 끝난 테이블 (실패 시 어디까지 반영됐는지 알려 주기 위해)
+    success = True
+    total_start = time.perf_counter()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for level in upload_levels(plan):
+                futures = {}
+                for table_name in level:
+                    df = frames.get(table_name)
+                    if df is None:
+                        continue
+                    print(f"🚀 '{table_name}' 테이블에 {len(df)}개 데이터 업로드 시작... (mode={mode})")
+                    if table_name in replace_keys:
+                        future = executor.submit(run.replace_chunk, df, table_name, mode, replace_keys[table_name], replace_ids)
+                        futures[future] = table_name
+                        continue
+                    n_chunks = max(1, min(workers, -(-len(df) // PARALLEL_CHUNK_ROWS)))
+                    chunk_rows = -(-len(df) // n_chunks) if len(df) else 0
+                    for i in range(n_chunks):
+                        chunk = df.iloc[i * chunk_rows:(i + 1) * chunk_rows]
+                        futures[executor.submit(run.load_chunk, chunk, table_name, mode)] = table_name
+
+                done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+                failed = [f for f in done if f.exception() is not None]
+                if failed:
+                    run.abort.set()
+                    for f in not_done:
+                        f.cancel()
+                    wait(not_done)
+                    for f in failed:
+                        err = f.exception()
+                        print(f"❌ 실패 ({futures[f]}): {getattr(err, 'orig', None) or err}")
+                    run.end_level(False)
+                    success = False
+                    break
+
+                # 다음 단계(자식 테이블)의 FK 검사가 이 단계의 행을 볼 수 있도록 먼저 커밋
+                level_committed, partial, error = run.end_level(True)
+                committed.extend(sorted(level_committed))
+                if error is not None:
+                    print(f"❌ 커밋 실패: {getattr(error, 'orig', None) or error}")
+                    if partial:
+                        print(f"⚠️ 일부 조각만 커밋된 테이블: {', '.join(sorted(partial))} (다시 실행해서 맞춰 주세요)")
+                    success = False
+                    break
+                for f, table_name in futures.items():
+                    start, end = f.result()
+                    prev = timings.get(table_name, (start, end))
+                    timings[table_name] = (min(prev[0], start), max(prev[1], end))
+    except Exception as e:
+        print(f"❌ 업로드 중단: {getattr(e, 'orig', None) or e}")
+        success = False
+    finally:
+        run.close()
+
+    if not success:
+        print("⏪ 실패한 단계를 롤백했습니다.")
+        if committed:
+            print(f"⚠️ 이미 커밋된 테이블: {', '.join(committed)} (upsert 모드로 다시 실행하면 나머지가 이어서 반영됩니다)")
+        return False
+
+    for table_name, (start, end) in timings.items():
+        rows = len(frames[table_name])
+        elapsed = end - start
+        print(f"✅ 성공! ({table_name}) {rows}행 / {elapsed:.2f}초 ({rows / max(elapsed, 1e-6):,.0f} rows/s)")
+    print(f"⏱️ 전체 {time.perf_counter() - total_start:.2f}초 (워커 {workers}개)")
+    return True
+
+def main(delta=False, mode='upsert', workers=UPLOAD_WORKERS):
+    # --delta: etl/main.py --incremental 이 만든 변경분(delta_clean_*.csv)만 업로드
+    prefix = 'delta_' if delta else ''
+
+    # deps: FK로 참조하는 부모 테이블 (부모가 먼저 적재되어야 함)
+    plan = [
+        {'file': f'{prefix}clean_category.csv', 'table': 'category', 'deps': [], 'mapping': {
+            'category_id': 'category_id',
+            'category_name': 'category_name'
+        }},
+        {'file': f'{prefix}clean_recipe_video.csv', 'table': 'recipe_video', 'deps': ['category'], 'mapping': {
+            'recipe_video_id': 'recipe_video_id',
+            'video_title': 'video_title',
+            'thumbnail_url': 'thumbnail_url',
+            'video_url': 'video_url',
+            'view_count': 'view_count',
+            'duration': 'duration',
+            'category_id': 'category_id'
+        }},
+        {'file': f'{prefix}clean_items.csv', 'table': 'items', 'deps': [], 'mapping': {
+            'item_id': 'item_id',
+            'item_name': 'item_name',
+            'item_img': 'item_img'
+        }},
+        {'file': f'{prefix}clean_recipe_items.csv', 'table': 'recipe_items', 'deps': ['recipe_video', 'items'], 'replace_key': 'recipe_video_id', 'mapping': {
+            'recipe_video_id': 'recipe_video_id',
+            'item_id': 'item_id'
+        }},
+        {'file': f'{prefix}clean_recipe_steps.csv', 'table': 'recipe_steps', 'deps': ['recipe_video'], 'replace_key': 'recipe_video_id', 'mapping': {
+            'recipe_video_id': 'recipe_video_id',
+            'step_number': 'step_number',
+            'step_title': 'step_title',
+            'content': 'content'
+        }},
+    ]
+
+    # --delta: 변경된 레시피의 자식 테이블(재료/조리 단계)은 기존 행을 지우고 다시 적재
+    replace_ids = None
+    if delta:
+        ids_df = read_upload('delta_changed_ids.csv', 'delta_changed_ids')
+        if ids_df is None:
+            print("⚠️ delta_changed_ids.csv 가 없어 기존 재료/조리 단계 행을 지우지 않습니다. (etl/main.py --incremental 을 다시 실행하세요)")
+        else:
+            replace_ids = sorted({int(i) for i in ids_df['recipe_video_id'].dropna()})
 
-    
-    print(f"🚀 '{table_name}' 테이블에 {len(df)}개 데이터 업로드 시작...")
-    
     try:
-        
-        df.to_sql(name=table_name, con=db_connection, if_exists='append', index=False)
-        print(f"✅ 성공! ({table_name})")
+        engine = create_db_engine(workers)
+        print(f"✅ DB 연결 준비: {engine.url.database} (워커 {workers}개)")
     except Exception as e:
-        print(f"❌ 실패 ({table_name}): {e}")
-
-def main():
-
-    upload_csv('clean_category.csv', 'category', mapping={
-        'category_id': 'category_id', 
-        'category_name': 'category_name'
-    })
-
-    upload_csv('clean_recipe_video.csv', 'recipe_video', mapping={
-        'recipe_video_id': 'recipe_video_id',
-        'video_title': 'video_title',
-        'thumbnail_url': 'thumbnail_url',
-        'video_url': 'video_url',
-        'view_count': 'view_count',
-        'duration': 'duration',       
-        'category_id': 'category_id'
-    })
-
-    upload_csv('clean_items.csv', 'items', mapping={
-        'item_id': 'item_id',
-        'item_name': 'item_name',
-        'item_img': 'item_img'
-    })
-
-    upload_csv('clean_recipe_items.csv', 'recipe_items', mapping={
-        'recipe_video_id': 'recipe_video_id',
-        'item_id': 'item_id'
-    })
-
-    upload_csv('clean_recipe_steps.csv', 'recipe_steps', mapping={
-        'recipe_video_id': 'recipe_video_id',
-        'step_number': 'step_number',
-        'step_title': 'step_title',   
-        'content': 'content'
-    })
+        print(f"❌ DB 연결 실패: {e}")
+        return False
+
+    if not upload_all(plan, mode=mode, workers=workers, engine=engine, replace_ids=replace_ids):
+        return False
 
     print("\n🎉 모든 데이터 업로드 완료!")
+    return True
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--delta', action='store_true', help='delta_clean_*.csv (증분 ETL 변경분)만 업로드')
+    parser.add_argument('--mode', choices=['upsert', 'append', 'infile'], default='upsert', help='적재 방식 (기본: upsert)')
+    parser.add_argument('--workers', type=int, default=UPLOAD_WORKERS, help='동시에 적재할 커넥션 수')
+    args = parser.parse_args()
+    exit(0 if main(delta=args.delta, mode=args.mode, workers=args.workers) else 1)
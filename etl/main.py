@@ -1,9 +1,17 @@
 import pandas as pd
-import json
 import os
+import sys
+import glob
+import argparse
 from datetime import datetime
 from sqlalchemy import create_engine 
 from dotenv import load_dotenv  
+from steps import extract_steps, flatten_steps
+from watermark import load_watermark, save_watermark, content_hashes, changed_recipe_ids, vocabulary_hash, load_vocabulary_hash
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.table_io import read_table, write_table, table_exists
+from common import telemetry
 
 load_dotenv()
 
@@ -18,29 +26,80 @@ DB_NAME = os.getenv("DB_NAME")
 
 DB_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-def main():
+# steps_json 파싱에 사용할 프로세스 수 (1이면 단일 프로세스)
+ETL_WORKERS = int(os.getenv("ETL_WORKERS", "1"))
+
+def map_recipe_items(merged_df, item_id_map):
+    """item_name("떡, 파, ...")을 split/explode 후 items 테이블과 merge해서 (recipe_video_id, item_id) 테이블 생성"""
+    items = merged_df[['recipe_video_id', 'item_name']].dropna(subset=['item_name'])
+    items = items.assign(item_name=items['item_name'].astype(str).str.split(',')).explode('item_name')
+    items['item_name'] = items['item_name'].str.strip()
+
+    df_item_ids = pd.DataFrame({'item_name': list(item_id_map.keys()), 'item_id': list(item_id_map.values())})
+    mapped = items.merge(df_item_ids, on='item_name', how='left')
+
+    excluded_items = set(mapped.loc[mapped['item_id'].isna(), 'item_name'])
+    recipe_items_df = mapped.dropna(subset=['item_id'])[['recipe_video_id', 'item_id']].astype(int)
+    return recipe_items_df, excluded_items
+
+def save_table(df, file_name, key='recipe_video_id', changed_ids=None):
+    """
+    전체 스냅샷(clean_*.csv, DATA_FORMAT=parquet이면 .parquet)을 저장.
+    changed_ids가 주어지면(증분 모드) 변경분만 delta_clean_*.csv로 따로 쓰고,
+    기존 스냅샷에서 해당 레시피 행만 교체합니다.
+    """
+    if changed_ids is None:
+        write_table(df, file_name)
+        return
+
+    write_table(df, f'delta_{file_name}')
+    if table_exists(file_name):
+        df_old = read_table(file_name)
+        df_old = df_old[~df_old[key].isin(changed_ids)]
+        df = pd.concat([df_old, df], ignore_index=True)
+    write_table(df, file_name)
+
+def main(incremental=False):
     print("📂 데이터 파일을 읽는 중...")
+
+    # 이전 실행의 delta 파일이 다시 업로드되지 않도록 먼저 정리
+    for delta_path in glob.glob('delta_clean_*.csv') + glob.glob('delta_clean_*.parquet') + glob.glob('delta_changed_ids.*'):
+        os.remove(delta_path)
     
-    if not os.path.exists(INFO_FILE_PATH) or not os.path.exists(DETAIL_FILE_PATH):
+    if not table_exists(INFO_FILE_PATH) or not table_exists(DETAIL_FILE_PATH):
         print("❌ 오류: 데이터 파일이 없습니다.")
         return
 
     try:
-        engine = create_engine(DB_URL)
-        df_mysql_items = pd.read_sql("SELECT item_id, item_name FROM items", engine)
+        with telemetry.stage('db_load'):
+            engine = create_engine(DB_URL)
+            df_mysql_items = pd.read_sql("SELECT item_id, item_name FROM items", engine)
+            df_mysql_cats = pd.read_sql("SELECT category_id, category_name FROM category", engine)
         item_id_map = dict(zip(df_mysql_items['item_name'], df_mysql_items['item_id']))
-        
-        df_mysql_cats = pd.read_sql("SELECT category_id, category_name FROM category", engine)
         cat_id_map = dict(zip(df_mysql_cats['category_name'], df_mysql_cats['category_id']))
         
         print(f"✅ DB 연결 성공: 재료 {len(item_id_map)}개, 기존 카테고리 {len(cat_id_map)}개 로드 완료")
     except Exception as e:
+        if incremental:
+            # 재료 매핑 없이 진행하면 변경된 레시피의 재료가 전부 빠지고 워터마크까지 저장되어
+            # --delta 업로드가 기존 재료 행을 지운 뒤 다시는 만들지 않음
+            print(f"❌ DB 연결 실패: {e}")
+            print("⛔ 증분 모드에서는 재료/카테고리를 DB에서 읽어야 하므로 중단합니다. (워터마크 저장 안 함)")
+            return False
         print(f"❌ DB 연결 실패 (데이터 전처리를 계속 진행합니다): {e}")
         cat_id_map = {}
         item_id_map = {}
 
-    df_info = pd.read_csv(INFO_FILE_PATH)
-    df_detail_raw = pd.read_csv(DETAIL_FILE_PATH)
+    with telemetry.stage('read'):
+        df_info = read_table(INFO_FILE_PATH)
+        df_detail_raw = read_table(DETAIL_FILE_PATH)
+
+    # 증분 모드에서는 DB에 아직 올라가지 않은 이전 스냅샷의 카테고리 id도 유지
+    if incremental and table_exists('clean_category.csv'):
+        df_prev_cats = read_table('clean_category.csv')
+        for cat_name, cat_id in zip(df_prev_cats['category_name'], df_prev_cats['category_id']):
+            cat_id_map.setdefault(cat_name, int(cat_id))
+    known_categories = set(cat_id_map)
 
     csv_categories = df_info['category_name'].dropna().astype(str).str.strip().unique()
     
@@ -50,8 +109,10 @@ def main():
             current_max_id += 1
             cat_id_map[cat_name] = current_max_id
     
-    df_cat_save = pd.DataFrame([{'category_id': v, 'category_name': k} for k, v in cat_id_map.items()])
-    df_cat_save.to_csv('clean_category.csv', index=False, encoding='utf-8-sig')
+    df_cat_save = pd.DataFrame([{'category_id': v, 'category_name': k} for k, v in cat_id_map.items()], columns=['category_id', 'category_name'])
+    write_table(df_cat_save, 'clean_category.csv')
+    if incremental:
+        write_table(df_cat_save[~df_cat_save['category_name'].isin(known_categories)], 'delta_clean_category.csv')
     print(f"✅ clean_category.csv 생성 완료 (총 {len(df_cat_save)}개)")
 
 
@@ -60,8 +121,10 @@ def main():
     df_info.rename(columns=info_rename, inplace=True)
     df_detail_raw.rename(columns=detail_rename, inplace=True)
 
+    # Parquet에서 읽은 경우 이미 int64이므로 변환 생략
     for df in [df_info, df_detail_raw]:
-        df['recipe_video_id'] = pd.to_numeric(df['recipe_video_id'], errors='coerce')
+        if not pd.api.types.is_integer_dtype(df['recipe_video_id']):
+            df['recipe_video_id'] = pd.to_numeric(df['recipe_video_id'], errors='coerce')
     
     df_info = df_info.dropna(subset=['recipe_video_id'])
     df_detail = df_detail_raw.dropna(subset=['recipe_video_id']).drop_duplicates(subset=['recipe_video_id'])
@@ -71,42 +134,47 @@ def main():
     if 'video_title_x' in merged_df.columns: merged_df['video_title'] = merged_df['video_title_x']
     if 'video_url_x' in merged_df.columns: merged_df['video_url'] = merged_df['video_url_x']
 
-
-    recipe_item_rows = []
-    excluded_items = set()
-    for idx, row in merged_df.iterrows():
-        if pd.isna(row['item_name']): continue
-        items = [x.strip() for x in str(row['item_name']).split(',')]
-        for itm in items:
-            if itm in item_id_map:
-                recipe_item_rows.append({'recipe_video_id': int(row['recipe_video_id']), 'item_id': item_id_map[itm]})
-            else:
-                excluded_items.add(itm)
-    
-    pd.DataFrame(recipe_item_rows).to_csv('clean_recipe_items.csv', index=False, encoding='utf-8-sig')
+    # 워터마크(지난 실행의 레시피별 해시)와 비교해서 새로 추가/변경된 레시피만 처리
+    hashes = content_hashes(merged_df)
+    vocab_hash = vocabulary_hash(item_id_map)
+    changed_ids = None
+    if incremental:
+        if load_vocabulary_hash() != vocab_hash:
+            # items 재료 목록이 바뀌면 예전에 매핑 못 한 재료가 있을 수 있으므로 전체를 변경분으로 처리
+            print("🔄 items 재료 목록이 지난 실행과 달라 전체 레시피를 다시 처리합니다.")
+            changed_ids = set(hashes)
+        else:
+            changed_ids = changed_recipe_ids(hashes, load_watermark())
+        if not changed_ids:
+            print("✅ 변경된 레시피가 없습니다. (증분 처리 생략)")
+            return
+        merged_df = merged_df[merged_df['recipe_video_id'].astype(int).isin(changed_ids)]
+        # 업로드 시 이 레시피들의 기존 재료/조리 단계 행을 지우고 다시 넣도록 id 목록을 같이 남김
+        write_table(pd.DataFrame({'recipe_video_id': sorted(int(i) for i in changed_ids)}), 'delta_changed_ids.csv')
+        print(f"🔄 증분 모드: 신규/변경 레시피 {len(changed_ids)}개만 처리합니다.")
+    telemetry.set_total(len(merged_df))
+
+    with telemetry.stage('items'):
+        recipe_items_df, excluded_items = map_recipe_items(merged_df, item_id_map)
+        save_table(recipe_items_df, 'clean_recipe_items.csv', changed_ids=changed_ids)
     print(f"✅ clean_recipe_items.csv 생성 완료")
 
-    step_rows = []
-    for idx, row in merged_df.iterrows():
-        json_str = row.get('steps_json') if 'steps_json' in row else row.get('recipe_json')
-        if pd.isna(json_str) or str(json_str).strip() in ['[]', '']: continue
-        try:
-            clean_json = str(json_str).replace('```json', '').replace('```', '').strip()
-            if clean_json.startswith('"') and clean_json.endswith('"'): clean_json = clean_json[1:-1]
-            clean_json = clean_json.replace('""', '"')
-            steps = json.loads(clean_json)
-            for s in steps:
-                step_rows.append({
-                    'recipe_video_id': int(row['recipe_video_id']),
-                    'step_number': s.get('step', 0),
-                    'step_title': s.get('step_title', ''),
-                    'content': s.get('step_detail', s.get('description', ''))
-                })
-        except: pass
-
-    pd.DataFrame(step_rows).to_csv('clean_recipe_steps.csv', index=False, encoding='utf-8-sig')
+    with telemetry.stage('steps'):
+        if 'steps' in merged_df.columns:
+            steps_df, rejects_df, step_counters = flatten_steps(merged_df)
+        else:
+            json_col = 'steps_json' if 'steps_json' in merged_df.columns else 'recipe_json'
+            steps_df, rejects_df, step_counters = extract_steps(merged_df, json_col, workers=ETL_WORKERS)
+        save_table(steps_df, 'clean_recipe_steps.csv', changed_ids=changed_ids)
     print(f"✅ clean_recipe_steps.csv 생성 완료")
 
+    # 파싱 실패/부분 복구된 레시피는 재처리 대상으로 따로 기록
+    save_table(rejects_df, 'clean_recipe_steps_rejects.csv', changed_ids=changed_ids)
+    summary = ", ".join(f"{k} {v}개" for k, v in sorted(step_counters.items()))
+    print(f"📊 steps_json 파싱 결과: {summary}")
+    print(f"⚠️ clean_recipe_steps_rejects.csv 생성 완료 (재처리 대상 {len(rejects_df)}개)")
+    telemetry.note('steps_json', dict(step_counters))
+
     video_df = merged_df.copy()
     
     video_df['category_name'] = video_df['category_name'].fillna('기타').astype(str).str.strip()
@@ -119,8 +187,27 @@ def main():
     final_cols = ['recipe_video_id', 'video_title', 'thumbnail_url', 'view_count', 'duration', 'category_id', 'video_url']
     video_df = video_df[final_cols]
     
-    video_df.to_csv('clean_recipe_video.csv', index=False, encoding='utf-8-sig')
+    with telemetry.stage('video'):
+        save_table(video_df, 'clean_recipe_video.csv', changed_ids=changed_ids)
     print(f"✅ clean_recipe_video.csv 생성 완료")
 
+    save_watermark(hashes, vocabulary=vocab_hash)
+    print(f"💾 워터마크 저장 완료 (레시피 {len(hashes)}개)")
+    rejected = rejects_df['recipe_video_id'].nunique()
+    telemetry.tick(ok=True, n=len(merged_df) - rejected)
+    telemetry.tick(ok=False, n=rejected)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--incremental', action='store_true', help='신규/변경 레시피만 처리하고 delta_clean_*.csv를 함께 생성')
+    args = parser.parse_args()
+
+    telemetry.start_run('etl')
+    try:
+        ok = main(incremental=args.incremental)
+    except BaseException:
+        telemetry.finish('failed')
+        raise
+    telemetry.finish('failed' if ok is False else 'ok')
+    if ok is False:
+        exit(1)
@@ -0,0 +1,90 @@
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.steps_json import parse_steps_json
+
+STEP_COLUMNS = ['recipe_video_id', 'step_number', 'step_title', 'content']
+REJECT_COLUMNS = ['recipe_video_id', 'reason', 'detail']
+
+
+def parse_steps_batch(batch):
+    """(recipe_video_id, steps_json) 묶음을 파싱해서 (step 테이블, 거절 테이블, 카운터) 반환"""
+    ids, numbers, titles, contents = [], [], [], []
+    rejects = []
+    counters = Counter()
+
+    for recipe_video_id, raw in batch:
+        steps, status, detail = parse_steps_json(raw)
+        counters[status] += 1
+
+        if not steps:
+            rejects.append((recipe_video_id, status, detail))
+            continue
+        if status == 'recovered':
+            rejects.append((recipe_video_id, status, f"{len(steps)}개 단계 복구: {detail}"))
+
+        for s in steps:
+            ids.append(recipe_video_id)
+            numbers.append(s.get('step', s.get('step_number', 0)))
+            titles.append(s.get('step_title', ''))
+            contents.append(s.get('step_detail', s.get('description', '')))
+
+    steps_df = pd.DataFrame({'recipe_video_id': ids, 'step_number': numbers, 'step_title': titles, 'content': contents}, columns=STEP_COLUMNS)
+    rejects_df = pd.DataFrame(rejects, columns=REJECT_COLUMNS)
+    return steps_df, rejects_df, counters
+
+
+def extract_steps(df, json_col, workers=1, batch_size=2000):
+    """
+    df의 json_col(steps_json)을 배치 단위로 파싱해 step 테이블 하나로 합쳐서 반환.
+    workers > 1 이면 배치들을 여러 프로세스에 나눠서 파싱합니다.
+    return: (step 테이블, 거절 테이블, 상태별 카운터)
+    """
+    pairs = list(zip(df['recipe_video_id'].astype(int), df[json_col]))
+    batches = [pairs[i:i + batch_size] for i in range(0, len(pairs), batch_size)]
+    if not batches:
+        return pd.DataFrame(columns=STEP_COLUMNS), pd.DataFrame(columns=REJECT_COLUMNS), Counter()
+
+    if workers > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(parse_steps_batch, batches))
+    else:
+        results = [parse_steps_batch(batch) for batch in batches]
+
+    counters = Counter()
+    for _, _, c in results:
+        counters.update(c)
+
+    steps_df = pd.concat([r[0] for r in results], ignore_index=True)
+    rejects_df = pd.concat([r[1] for r in results], ignore_index=True)
+    return steps_df, rejects_df, counters
+
+
+def flatten_steps(df, steps_col='steps', status_col='steps_status'):
+    """
+    Parquet에서 읽은 steps(list<struct>) 컬럼을 JSON 파싱 없이 explode로 바로 평탄화.
+    파싱 상태는 scraper 단계에서 steps_status로 저장되어 있으므로 그대로 거절 테이블을 만듭니다.
+    """
+    status = df[status_col].fillna('missing_steps') if status_col in df.columns else pd.Series('ok', index=df.index)
+    counters = Counter(status)
+
+    rejected = ~status.isin(['ok', 'trailing_text'])
+    rejects_df = pd.DataFrame({'recipe_video_id': df.loc[rejected, 'recipe_video_id'].astype(int), 'reason': status[rejected], 'detail': ''}, columns=REJECT_COLUMNS)
+
+    exploded = df[['recipe_video_id', steps_col]].explode(steps_col).dropna(subset=[steps_col])
+    if exploded.empty:
+        return pd.DataFrame(columns=STEP_COLUMNS), rejects_df.reset_index(drop=True), counters
+
+    fields = pd.DataFrame(exploded[steps_col].tolist())
+    steps_df = pd.DataFrame({
+        'recipe_video_id': exploded['recipe_video_id'].astype(int).to_numpy(),
+        'step_number': fields['step'],
+        'step_title': fields['step_title'],
+        'content': fields['step_detail'],
+    }, columns=STEP_COLUMNS)
+    return steps_df, rejects_df.reset_index(drop=True), counters
@@ -0,0 +1,58 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+
+import pandas as pd
+
+WATERMARK_FILE = 'etl_watermark.json'
+
+
+def load_watermark(path=WATERMARK_FILE):
+    """지난 ETL 실행에서 처리한 {recipe_video_id: content hash} 로드 (없으면 빈 dict)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return {int(k): v for k, v in data.get('recipes', {}).items()}
+
+
+def load_vocabulary_hash(path=WATERMARK_FILE):
+    """지난 ETL 실행 때의 items 재료 목록 해시 (없으면 None)"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('vocabulary')
+
+
+def save_watermark(hashes, vocabulary=None, path=WATERMARK_FILE):
+    data = {
+        'updated_at': datetime.now().isoformat(timespec='seconds'),
+        'vocabulary': vocabulary,
+        'recipes': {str(k): v for k, v in sorted(hashes.items())},
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def vocabulary_hash(item_id_map):
+    """
+    재료 매핑(item_name → item_id) 해시.
+    items 테이블에 재료가 추가되면 예전에 매핑되지 않았던 레시피 재료도 다시 매핑해야 하므로
+    레시피 내용 해시와 별도로 저장해서, 바뀌면 전체 레시피를 변경된 것으로 봅니다.
+    """
+    raw = json.dumps(sorted((str(k), int(v)) for k, v in item_id_map.items()), ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def content_hashes(df):
+    """레시피 행(원본 + 크롤링 결과) 전체 내용으로 만든 recipe_video_id별 해시"""
+    row_hash = pd.util.hash_pandas_object(df.drop(columns=['recipe_video_id']).astype(str), index=False)
+    return dict(zip(df['recipe_video_id'].astype(int), row_hash.map('{:016x}'.format)))
+
+
+def changed_recipe_ids(hashes, watermark):
+    """새로 추가됐거나 내용이 바뀐 recipe_video_id 목록"""
+    return {rid for rid, h in hashes.items() if watermark.get(rid) != h}
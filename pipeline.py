@@ -0,0 +1,210 @@
+"""
+전체 데이터 파이프라인 실행기 (scraper → etl → db 업로드 / rag ingest)
+
+각 단계의 입력 파일/코드를 해시해서 지난 실행과 같으면 건너뛰고,
+서로 의존하지 않는 단계(db 업로드와 rag ingest 등)는 동시에 실행합니다.
+
+사용법 (루트 디렉토리에서):
+    python pipeline.py                # 바뀐 단계만 실행
+    python pipeline.py --force        # 캐시 무시하고 전부 실행
+    python pipeline.py etl upload     # 지정한 단계만 실행
+"""
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_FILE = os.path.join(BASE_DIR, '.pipeline_cache.json')
+
+# 모든 단계가 공유하는 코드/설정 (바뀌면 전 단계 재실행)
+COMMON_CODE = ['common/*.py']
+COMMON_ENV = ['DATA_FORMAT']
+
+# name: 실행 위치(cwd), 명령, 선행 단계, 입력/코드/출력 파일 패턴 (BASE_DIR 기준)
+STAGES = {
+    'scrape': {
+        'cwd': 'scraper',
+        'cmd': ['main.py'],
+        'deps': [],
+        'inputs': ['data/recipes_data.*'],
+        'code': ['scraper/*.py'],
+        'outputs': ['data/recipes_scraper.csv'],
+    },
+    'etl': {
+        'cwd': 'etl',
+        'cmd': ['main.py'],
+        'deps': ['scrape'],
+        'inputs': ['data/recipes_data.*', 'data/recipes_scraper.*'],
+        'code': ['etl/*.py'],
+        'outputs': ['etl/clean_*'],
+    },
+    'upload': {
+        'cwd': '.',
+        'cmd': ['db_upload_all.py'],
+        'deps': ['etl'],
+        'inputs': ['etl/clean_*'],
+        'code': ['db_upload_all.py'],
+        'outputs': [],
+    },
+    'ingest': {
+        'cwd': 'rag',
+        'cmd': ['ingest.py'],
+        'deps': ['scrape'],
+        'inputs': ['data/recipes_data.*', 'data/recipes_scraper.*'],
+        'code': ['rag/ingest.py'],
+        'outputs': ['rag/chroma_db'],
+    },
+}
+
+
+def load_cache():
+    if not os.path.exists(CACHE_FILE):
+        return {'stages': {}, 'files': {}}
+    with open(CACHE_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_cache(cache):
+    tmp_path = CACHE_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, CACHE_FILE)
+
+
+def expand(patterns):
+    paths = set()
+    for pattern in patterns:
+        paths.update(p for p in glob.glob(os.path.join(BASE_DIR, pattern)) if os.path.isfile(p))
+    return sorted(paths)
+
+
+def file_hash(path, file_cache):
+    """파일 내용 sha256. 크기/수정시각이 같으면 지난번 해시를 재사용해서 큰 파일도 매번 읽지 않음"""
+    stat = os.stat(path)
+    rel = os.path.relpath(path, BASE_DIR)
+    cached = file_cache.get(rel)
+    if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+        return cached['sha256']
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    file_cache[rel] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': h.hexdigest()}
+    return h.hexdigest()
+
+
+def stage_fingerprint(name, file_cache):
+    """입력 파일 + 단계 코드 + 공통 코드/설정을 하나의 해시로"""
+    stage = STAGES[name]
+    h = hashlib.sha256()
+    for path in expand(stage['inputs'] + stage['code'] + COMMON_CODE):
+        h.update(os.path.relpath(path, BASE_DIR).encode())
+        h.update(file_hash(path, file_cache).encode())
+    for key in COMMON_ENV:
+        h.update(f"{key}={os.getenv(key, '')}".encode())
+    return h.hexdigest()
+
+
+def outputs_exist(name):
+    return all(glob.glob(os.path.join(BASE_DIR, pattern)) for pattern in STAGES[name]['outputs'])
+
+
+def run_stage(name):
+    stage = STAGES[name]
+    cwd = os.path.join(BASE_DIR, stage['cwd'])
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + stage['cmd'], cwd=cwd)
+    return result.returncode, time.perf_counter() - start
+
+
+def main(selected=None, force=False, workers=4):
+    selected = selected or list(STAGES)
+    cache = load_cache()
+    file_cache = cache.setdefault('files', {})
+    stage_cache = cache.setdefault('stages', {})
+
+    # 선택하지 않은 선행 단계는 이미 최신이라고 보고 기다리지 않음
+    pending = set(selected)
+    done, failed = set(), set()
+    timings = {}
+
+    def ready(name):
+        return all(dep in done or dep not in selected for dep in STAGES[name]['deps'])
+
+    print(f"🚀 파이프라인 시작: {', '.join(selected)}")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {}
+        while pending or running:
+            # 선행 단계가 실패한 단계는 실행하지 않음
+            for name in sorted(pending):
+                if any(dep in failed for dep in STAGES[name]['deps']):
+                    pending.discard(name)
+                    failed.add(name)
+                    timings[name] = ('blocked', 0.0)
+                    print(f"⛔ [{name}] 선행 단계 실패로 실행하지 않음")
+
+            for name in sorted(pending):
+                if not ready(name):
+                    continue
+                pending.discard(name)
+
+                fingerprint = stage_fingerprint(name, file_cache)
+                if not force and stage_cache.get(name, {}).get('fingerprint') == fingerprint and outputs_exist(name):
+                    print(f"⏭️  [{name}] 변경 없음 (건너뜀)")
+                    timings[name] = ('skipped', 0.0)
+                    done.add(name)
+                    continue
+
+                print(f"▶️  [{name}] 실행 중...")
+                running[executor.submit(run_stage, name)] = (name, fingerprint)
+
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, fingerprint = running.pop(future)
+                returncode, elapsed = future.result()
+                if returncode == 0:
+                    done.add(name)
+                    timings[name] = ('ran', elapsed)
+                    stage_cache[name] = {
+                        'fingerprint': fingerprint,
+                        'finished_at': datetime.now().isoformat(timespec='seconds'),
+                        'seconds': round(elapsed, 2),
+                    }
+                    save_cache(cache)
+                    print(f"✅ [{name}] 완료 ({elapsed:.1f}초)")
+                else:
+                    failed.add(name)
+                    timings[name] = ('failed', elapsed)
+                    print(f"❌ [{name}] 실패 (exit {returncode}, {elapsed:.1f}초)")
+
+    save_cache(cache)
+
+    print("\n📊 단계별 실행 결과")
+    for name in selected:
+        status, elapsed = timings.get(name, ('-', 0.0))
+        print(f"   {name:<8} {status:<8} {elapsed:7.1f}초")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('stages', nargs='*', help=f"실행할 단계 (기본: 전체) {list(STAGES)}")
+    parser.add_argument('--force', action='store_true', help='캐시를 무시하고 모든 단계를 다시 실행')
+    parser.add_argument('--workers', type=int, default=4, help='동시에 실행할 최대 단계 수')
+    args = parser.parse_args()
+    unknown = [name for name in args.stages if name not in STAGES]
+    if unknown:
+        parser.error(f"알 수 없는 단계: {unknown}")
+    sys.exit(main(selected=args.stages, force=args.force, workers=args.workers))
@@ -1,17 +1,20 @@
 import os
+import sys
+import json
 import pandas as pd
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 from langchain_core.documents import Document
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.table_io import read_table
+from common import openai_client, telemetry
+
 # 환경 변수 로드 (.env 파일에 OPENAI_API_KEY가 있어야 합니다)
 load_dotenv()
 
-api_key = os.getenv("OPENAI_API_KEY")
-api_base = os.getenv("OPENAI_API_BASE")
-
 print(f"🔑 OpenAI API 연동 준비 중...")
+telemetry.start_run('ingest')
 
 # 파일 경로 설정 (데이터 파일이 같은 폴더에 있어야 합니다)
 data_path = "../data/recipes_data.csv"
@@ -19,14 +22,19 @@ scraper_path = "../data/recipes_scraper.csv"
 
 try:
     # 1. 두 가지 데이터 소스 로드
-    df_data = pd.read_csv(data_path)
-    df_scraper = pd.read_csv(scraper_path)
+    # 필요한 컬럼만 읽습니다 (DATA_FORMAT=parquet이면 steps는 list 컬럼, id는 이미 int64)
+    df_data = read_table(data_path, columns=['recipe_video_id', 'video_title', 'category_name', 'item_name'])
+    df_scraper = read_table(scraper_path, columns=['recipe_video_id', 'steps_json', 'steps', 'thumbnail_url'])
+    if 'steps' in df_scraper.columns:
+        df_scraper['steps_json'] = [json.dumps(list(s), ensure_ascii=False) if s is not None and len(s) else None for s in df_scraper['steps']]
 
     # ---------------------------------------------------------
     # [추가] 두 데이터프레임의 ID 컬럼을 숫자형(int64)으로 강제 변환
     # errors='coerce'를 사용하면 숫자가 아닌 값은 NaN으로 변환됩니다.
-    df_data['recipe_video_id'] = pd.to_numeric(df_data['recipe_video_id'], errors='coerce')
-    df_scraper['recipe_video_id'] = pd.to_numeric(df_scraper['recipe_video_id'], errors='coerce')
+    # (Parquet에서 읽어 이미 정수형이면 변환을 건너뜁니다)
+    for df_src in [df_data, df_scraper]:
+        if not pd.api.types.is_integer_dtype(df_src['recipe_video_id']):
+            df_src['recipe_video_id'] = pd.to_numeric(df_src['recipe_video_id'], errors='coerce')
 
     # ID가 없는(NaN) 행은 병합이 불가능하므로 제거합니다.
     df_data = df_data.dropna(subset=['recipe_video_id'])
@@ -47,6 +55,7 @@ try:
 except Exception as e:
     print(f"❌ 파일 로드 실패: {e}")
     print("recipes_data.csv와 recipes_scraper.csv 파일이 현재 폴더에 있는지 확인해주세요.")
+    telemetry.finish('failed')
     exit()
 
 docs = []
@@ -72,10 +81,10 @@ for index, row in df.iterrows():
     docs.append(doc)
 
 print(f"🚀 총 {len(docs)}개의 문서 벡터화 시작 (text-embedding-3-small)...")
+telemetry.set_total(len(docs))
 
-embedding_model = OpenAIEmbeddings(
-    openai_api_key=api_key,
-    openai_api_base=api_base,
+# common/openai_client.py 를 통해 호출 (요청 간격 제한, 재시도, OPENAI_MODE 녹화/재생)
+embedding_model = openai_client.Embeddings(
     model="text-embedding-3-small",
     # 한 번에 요청할 데이터 개수를 제한합니다 (기본값은 1000이지만, 10~50 정도로 줄여보세요)
     chunk_size=10 
@@ -84,10 +93,14 @@ embedding_model = OpenAIEmbeddings(
 persist_directory = "./chroma_db"
 
 # 기존 DB가 있다면 덮어쓰거나 새로 생성합니다.
-vectorstore = Chroma.from_documents(
-    documents=docs,
-    embedding=embedding_model,
-    persist_directory=persist_directory
-)
+with telemetry.stage('embed'):
+    vectorstore = Chroma.from_documents(
+        documents=docs,
+        embedding=embedding_model,
+        persist_directory=persist_directory
+    )
+telemetry.tick(n=len(docs))
 
-print(f"✨ 벡터 DB 구축 완료! '{persist_directory}' 폴더에 저장되었습니다.")
\ No newline at end of file
+openai_client.print_usage()
+print(f"✨ 벡터 DB 구축 완료! '{persist_directory}' 폴더에 저장되었습니다.")
+telemetry.finish()
\ No newline at end of file
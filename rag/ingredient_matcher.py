@@ -0,0 +1,227 @@
+"""
+자유 입력 문장 → 표준 재료명(items 테이블의 item_name) 추출
+
+    matcher = build_matcher()
+    matcher.extract("냉장고에 양파랑 계란 있어")   # ['양파', '달걀']
+    matcher.canonicalize(['대파', '양파'])          # ['파', '양파']
+
+- 서버 시작 시 items 테이블 재료명 + 동의어 표(item_synonyms.csv)로 Aho-Corasick 오토마톤을 한 번 만들어 두고,
+  요청마다 문장을 한 번 훑어서 모든 후보를 찾음 (LLM 호출 없음)
+- 겹치는 후보는 가장 왼쪽 → 가장 긴 것 우선 ("양파"가 "파"보다, "고추장"이 "고추"보다 먼저)
+- 2글자 이하 재료(파, 무, 김, 가지 ...)는 단어 앞에서 시작하고 뒤가 끝/조사일 때만 인정
+  ("가지고 있어"의 '가지', "무엇"의 '무'를 재료로 잡지 않도록)
+- DB에 연결할 수 없으면 recipes_data.csv 의 item_name 으로 재료 목록을 만듦
+"""
+import os
+import sys
+import unicodedata
+from collections import deque
+
+import pandas as pd
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.table_io import read_table, table_exists
+
+load_dotenv()
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(CURRENT_DIR)
+SYNONYMS_FILE = os.getenv("ITEM_SYNONYMS_FILE", os.path.join(CURRENT_DIR, 'item_synonyms.csv'))
+RECIPES_FILE = os.path.join(BASE_DIR, 'data', 'recipes_data.csv')
+
+SHORT_PATTERN_LEN = 2
+# 짧은 재료명 뒤에 붙어도 되는 조사/어미 (긴 것부터 검사)
+PARTICLES = sorted(['이랑', '하고', '으로', '까지', '밖에', '이나', '이든',
+                    '이', '가', '을', '를', '은', '는', '도', '랑', '과', '와', '만', '에', '의', '로', '나', '좀', '들', '뿐'],
+                   key=len, reverse=True)
+
+
+def normalize(text):
+    return unicodedata.normalize('NFC', str(text)).strip().lower()
+
+
+def _starts_cluster(ch):
+    """NFC 로 앞 글자와 합쳐지지 않는 글자 (결합 문자 / 한글 중성·종성 자모가 아니면 새 글자)"""
+    return not (unicodedata.combining(ch) or '\u1161' <= ch <= '\u1175' or '\u11a8' <= ch <= '\u11c2')
+
+
+def normalize_with_offsets(text):
+    """
+    normalize 와 같지만 앞뒤 공백을 지우지 않고, 정규화된 글자마다 원문 위치(시작, 끝)를 같이 반환.
+    (NFD 로 들어온 한글처럼 정규화 후 길이가 달라져도 원문 offset 을 돌려줄 수 있도록)
+    """
+    text = str(text)
+    norm, spans = [], []
+    start = 0
+    for i in range(1, len(text) + 1):
+        if i < len(text) and not _starts_cluster(text[i]):
+            continue
+        piece = unicodedata.normalize('NFC', text[start:i]).lower()
+        norm.append(piece)
+        spans.extend([(start, i)] * len(piece))
+        start = i
+    return "".join(norm), spans
+
+
+def _is_word_char(ch):
+    """한글/영문 글자 (숫자, 공백, 문장부호는 경계로 봄)"""
+    return ch.isalpha()
+
+
+class IngredientMatcher:
+    def __init__(self, vocabulary, synonyms=None):
+        """
+        vocabulary: 표준 재료명 목록
+        synonyms: {별칭: 표준 재료명} — 표준 재료명이 vocabulary 에 없거나,
+                  별칭 자체가 vocabulary 에 있는 재료면(예: 진간장) 무시
+        """
+        self.items = sorted({str(v).strip() for v in vocabulary if str(v).strip()})
+        canonical = {normalize(item): item for item in self.items}
+
+        self.aliases = dict(canonical)
+        self.skipped_synonyms = 0
+        self.shadowed_synonyms = 0
+        for alias, item in (synonyms or {}).items():
+            target = canonical.get(normalize(item))
+            if target is None:
+                self.skipped_synonyms += 1
+                continue
+            if normalize(alias) in canonical:
+                # items 에 따로 있는 재료는 사용자가 쓴 그대로 돌려줌
+                self.shadowed_synonyms += 1
+                continue
+            self.aliases[normalize(alias)] = target
+
+        self._build(self.aliases)
+
+    def _build(self, patterns):
+        """goto / fail / output 테이블 생성 (노드 = 리스트 인덱스)"""
+        self._goto = [{}]
+        self._out = [[]]   # 노드에서 끝나는 패턴 길이들 (fail 링크로 이어진 것 포함, 긴 것부터)
+
+        for pattern in patterns:
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._out.append([])
+                node = nxt
+            self._out[node] = [len(pattern)]
+
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+                queue.append(nxt)
+
+    def _accept(self, text, start, end):
+        """짧은 재료명은 단어 경계 + (끝 or 조사)일 때만 인정"""
+        if end - start > SHORT_PATTERN_LEN:
+            return True
+        if start > 0 and _is_word_char(text[start - 1]):
+            return False
+        if end == len(text) or not _is_word_char(text[end]):
+            return True
+        rest = text[end:]
+        for particle in PARTICLES:
+            if rest.startswith(particle):
+                after = end + len(particle)
+                return after == len(text) or not _is_word_char(text[after])
+        return False
+
+    def find(self, text):
+        """
+        문장 → [(시작, 끝, 입력에 쓰인 표현, 표준 재료명), ...] (겹치지 않게, 나온 순서대로)
+        시작/끝은 원문(text) 기준 위치라서 text[시작:끝] == 입력에 쓰인 표현
+        """
+        text = str(text)
+        norm, spans = normalize_with_offsets(text)
+        candidates = []
+        node = 0
+        for i, ch in enumerate(norm):
+            while node and ch not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(ch, 0)
+            for length in self._out[node]:
+                start = i + 1 - length
+                if self._accept(norm, start, i + 1):
+                    candidates.append((start, i + 1))
+
+        # 가장 왼쪽 → 가장 긴 후보부터 겹치지 않게 선택
+        candidates.sort(key=lambda c: (c[0], c[0] - c[1]))
+        matches, last_end = [], 0
+        for start, end in candidates:
+            if start < last_end:
+                continue
+            orig_start, orig_end = spans[start][0], spans[end - 1][1]
+            matches.append((orig_start, orig_end, text[orig_start:orig_end], self.aliases[norm[start:end]]))
+            last_end = end
+        return matches
+
+    def extract(self, text):
+        """문장 → 표준 재료명 리스트 (중복 제거, 나온 순서대로)"""
+        if not text:
+            return []
+        return list(dict.fromkeys(item for _, _, _, item in self.find(text)))
+
+    def canonicalize(self, names):
+        """
+        재료명 리스트 → 표준 재료명 리스트.
+        별칭은 표준 이름으로 바꾸고, 목록에 없는 이름은 문장처럼 다시 찾아보고, 그래도 없으면 그대로 둠
+        """
+        result = []
+        for name in names:
+            key = normalize(name)
+            if not key:
+                continue
+            if key in self.aliases:
+                result.append(self.aliases[key])
+            else:
+                result.extend(self.extract(name) or [str(name).strip()])
+        return list(dict.fromkeys(result))
+
+
+def load_synonyms(path=SYNONYMS_FILE):
+    """item_synonyms.csv (alias,item_name) → {별칭: 표준 재료명}"""
+    if not os.path.exists(path):
+        return {}
+    df = pd.read_csv(path, comment='#', dtype=str).dropna()
+    return dict(zip(df['alias'].str.strip(), df['item_name'].str.strip()))
+
+
+def load_vocabulary():
+    """items 테이블 재료명 (DB 접속 실패 시 recipes_data.csv 의 item_name)"""
+    if os.getenv("DB_HOST"):
+        try:
+            from sqlalchemy import create_engine
+            db_url = (f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
+                      f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}")
+            df_items = pd.read_sql("SELECT item_name FROM items", create_engine(db_url))
+            return df_items['item_name'].dropna().tolist(), 'db'
+        except Exception as e:
+            print(f"⚠️ items 테이블 로드 실패 (recipes_data.csv 로 대체): {e}")
+
+    if not table_exists(RECIPES_FILE):
+        return [], 'none'
+    df = read_table(RECIPES_FILE, columns=['item_name'])
+    names = df['item_name'].dropna().astype(str).str.split(',').explode().str.strip()
+    return names[names != ''].unique().tolist(), 'recipes_data'
+
+
+def build_matcher():
+    vocabulary, source = load_vocabulary()
+    matcher = IngredientMatcher(vocabulary, load_synonyms())
+    print(f"🥕 재료 매처 준비 완료: 재료 {len(matcher.items)}개({source}), 별칭 {len(matcher.aliases) - len(matcher.items)}개"
+          + (f" (표준 재료가 없어 제외한 동의어 {matcher.skipped_synonyms}개)" if matcher.skipped_synonyms else "")
+          + (f" (별칭이 이미 재료라서 제외한 동의어 {matcher.shadowed_synonyms}개)" if matcher.shadowed_synonyms else ""))
+    return matcher
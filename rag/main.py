@@ -1,9 +1,9 @@
 import os
-from typing import List
+import sys
+from typing import List, Optional
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
-from langchain_openai import OpenAIEmbeddings
 from langchain_chroma import Chroma
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
@@ -11,6 +11,10 @@ from fastapi.middleware.cors import CORSMiddleware
 
 load_dotenv()
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common import openai_client
+from ingredient_matcher import build_matcher
+
 app = FastAPI()
 
 
@@ -28,15 +32,9 @@ app.add_middleware(
 
 
 db_path = "./chroma_db"
-api_key = os.getenv("OPENAI_API_KEY")
-api_base = os.getenv("OPENAI_API_BASE")
-
-# 임베딩 모델 설정
-embedding_model = OpenAIEmbeddings(
-    openai_api_key=api_key,
-    openai_api_base=api_base,
-    model="text-embedding-3-small"
-)
+
+# 임베딩 모델 설정 (common/openai_client.py: 커넥션 재사용, 재시도, OPENAI_MODE 녹화/재생)
+embedding_model = openai_client.Embeddings(model="text-embedding-3-small")
 
 # DB 존재 여부 확인
 if not os.path.exists(db_path):
@@ -49,15 +47,42 @@ vectorstore = Chroma(
 )
 print("✅ RAG 서버 준비 완료! ChromaDB가 성공적으로 로드되었습니다.")
 
+# 자유 입력 문장 / 별칭("대파", "계란") → items 테이블 재료명 (서버 시작 시 한 번 컴파일)
+matcher = build_matcher()
+
 class RecipeRequest(BaseModel):
-    selectedItems: List[str]
+    selectedItems: List[str] = []
+    text: Optional[str] = None  # "냉장고에 양파랑 계란 있어" 같은 자유 입력 (selectedItems와 합쳐서 사용)
 
 class RecipeResponse(BaseModel):
     recipe_ids: List[int] 
 
+class ItemExtractRequest(BaseModel):
+    text: str
+
+class ItemMatch(BaseModel):
+    item_name: str
+    matched_text: str
+    start: int
+    end: int
+
+class ItemExtractResponse(BaseModel):
+    items: List[str]
+    matches: List[ItemMatch]
+
+@app.post("/items/extract", response_model=ItemExtractResponse)
+async def extract_items(request: ItemExtractRequest):
+    """자유 입력 문장에서 재료명 추출 (LLM 호출 없음)"""
+    found = matcher.find(request.text)
+    return {
+        "items": list(dict.fromkeys(item for _, _, _, item in found)),
+        "matches": [{"item_name": item, "matched_text": matched, "start": start, "end": end} for start, end, matched, item in found],
+    }
+
 @app.post("/recipes/recommend/ai", response_model=RecipeResponse)
 async def recommend_recipes(request: RecipeRequest):
-    user_ingredients = request.selectedItems 
+    # 별칭은 표준 재료명으로 바꾸고, 자유 입력 문장에서 찾은 재료를 합침
+    user_ingredients = matcher.canonicalize(request.selectedItems + matcher.extract(request.text))
 
     if not user_ingredients:
         return {"recipe_ids": []} 
@@ -74,7 +99,7 @@ async def recommend_recipes(request: RecipeRequest):
         
         # 해결책: 문자열을 쉼표로 잘라 리스트화한 후 정확히 일치하는지 비교
         # 이렇게 하면 "파"가 "양파"의 일부로 인식되지 않습니다.
-        db_ingredients_list = [i.strip() for i in db_ingredients_str.split(',') if i.strip()]
+        db_ingredients_list = matcher.canonicalize(db_ingredients_str.split(','))
         
         match_count = 0
         for user_item in user_ingredients:
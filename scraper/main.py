@@ -1,6 +1,7 @@
 import os
-import time
-import random
+import sys
+import queue
+import threading
 import pandas as pd
 from selenium import webdriver
 from dotenv import load_dotenv
@@ -8,22 +9,40 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
-from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from youtube_api import get_video_stats
+from selenium.common.exceptions import (
+    TimeoutException, NoSuchElementException, WebDriverException,
+    InvalidSessionIdException, NoSuchWindowException,
+)
+from youtube_api import get_video_stats, get_videos_stats
 
 # 1. 환경변수 로드
 load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-api_base = os.getenv("OPENAI_API_BASE")
 
 # 2. 파일 경로 및 데이터 설정
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 os.makedirs(DATA_DIR, exist_ok=True)
 
+sys.path.append(BASE_DIR)
+from common.table_io import DATA_FORMAT, write_scraper_parquet, DedupCsvWriter
+from common.manifest import Manifest
+from common.ratelimit import DomainRateLimiter
+from common.steps_json import parse_steps_json
+from common.step_extractor import get_extractor
+from common import openai_client, telemetry
+from common.transcripts import TranscriptChain, cheap_tiers
+from common.transcript_prep import compact_segments, ROLLING_TIERS
+
 INPUT_FILE = os.path.join(DATA_DIR, 'recipes_data.csv')
 OUTPUT_FILE = os.path.join(DATA_DIR, 'recipes_scraper.csv')
+MANIFEST_FILE = os.path.join(DATA_DIR, 'scrape_manifest.json')
+
+# 3. 브라우저 풀 설정
+SCRAPER_WORKERS = int(os.getenv("SCRAPER_WORKERS", "3"))               # 동시에 띄울 브라우저 수
+SCRAPER_MIN_INTERVAL = float(os.getenv("SCRAPER_MIN_INTERVAL", "2"))   # 같은 도메인 페이지 요청 최소 간격(초)
+SCRAPER_JITTER = float(os.getenv("SCRAPER_JITTER", "1"))               # 간격에 더할 랜덤 지터(초)
+SCRAPER_HEADLESS = os.getenv("SCRAPER_HEADLESS", "true").lower() != "false"
+BROWSER_MAX_RESTARTS = 2                                               # 영상 하나당 브라우저 재시작 허용 횟수
 
 if os.path.exists(INPUT_FILE):
     df = pd.read_csv(INPUT_FILE)
@@ -42,125 +61,78 @@ def get_video_id(url):
     return video_id
 
 # [핵심] Selenium 봇 탐지 우회 및 강력한 자막 추출
-def get_info_via_selenium(driver, url):
-    info = { "transcript": None, "view_count": 0, "duration": "0:00" }
+def get_info_via_selenium(driver, url, limiter=None):
+    info = { "transcript": None, "segments": None }
     
     if not isinstance(url, str): return info
 
-    video_id = get_video_id(url)
-    
-    # API로 조회수 가져오기 (실패해도 크롤링은 계속)
-    if video_id:
-        try:
-            info["view_count"], info["duration"] = get_video_stats(video_id)
-        except:
-            pass
-
     # 크롤링 재시도 (최대 2번)
     for attempt in range(1, 3):
         try:
+            # 1. 같은 도메인 요청 간격 지키기 (워커 전체 공유)
+            if limiter: limiter.wait(url)
             driver.get(url)
-            
-            # 1. 페이지 로딩 대기 (랜덤 딜레이로 사람인 척)
-            time.sleep(random.uniform(3, 5))
-            
+
+            # 고정 sleep 대신 설명창이 뜰 때까지만 대기
             wait = WebDriverWait(driver, 10)
+            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "ytd-watch-metadata, #description")))
 
             # 2. '더보기' 버튼 찾아서 누르기 (설명창 확장)
             try:
                 expand_btn = wait.until(EC.element_to_be_clickable((By.ID, "expand")))
                 expand_btn.click()
-                time.sleep(1)
-            except:
+            except TimeoutException:
                 pass # 이미 펼쳐져 있거나 없으면 패스
 
             # 3. '스크립트 표시' 버튼 찾기 (여러 방법 시도)
             script_btn = None
             try:
                 # 방법 A: 최신 유튜브 UI (설명창 내부 버튼)
-                script_btn = driver.find_element(By.CSS_SELECTOR, "ytd-video-description-transcript-section-renderer button")
-            except:
+                script_btn = WebDriverWait(driver, 5).until(EC.presence_of_element_located((By.CSS_SELECTOR, "ytd-video-description-transcript-section-renderer button")))
+            except TimeoutException:
                 try:
                     # 방법 B: 텍스트로 찾기 (XPath) - 가장 강력함
                     script_btn = driver.find_element(By.XPATH, "//button[contains(@aria-label, '스크립트') or .//*[contains(text(), '스크립트')]]")
-                except:
+                except NoSuchElementException:
                     pass
 
             if script_btn:
                 # 자바스크립트로 강제 클릭 (가려져 있어도 클릭됨)
                 driver.execute_script("arguments[0].click();", script_btn)
-                time.sleep(2)
                 
                 # 4. 자막 텍스트 긁어오기
-                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "ytd-transcript-segment-renderer")))
+                wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "ytd-transcript-segment-renderer .segment-text")))
                 segments = driver.find_elements(By.CSS_SELECTOR, "ytd-transcript-segment-renderer .segment-text")
                 
                 # 텍스트 합치기
-                text = " ".join([seg.text for seg in segments]).replace("\n", " ")
+                texts = [seg.text for seg in segments]
+                text = " ".join(texts).replace("\n", " ")
                 
                 if len(text) > 50:
                     info["transcript"] = text
+                    info["segments"] = [{'start': None, 'text': t} for t in texts]
                     return info # 성공하면 즉시 리턴
             
             print(f"   ⚠️ 시도 {attempt}: 자막 버튼을 못 찾았습니다.")
 
-        except Exception as e:
-            print(f"   ⚠️ 시도 {attempt} 에러: {e}")
-            time.sleep(3) # 에러 나면 잠시 대기
+        except (InvalidSessionIdException, NoSuchWindowException):
+            raise # 브라우저가 죽은 경우: 워커가 브라우저를 새로 띄움
+        except WebDriverException as e:
+            if is_browser_crash(e): raise
+            print(f"   ⚠️ 시도 {attempt} 에러: {e.msg}")
 
     return info
 
-def format_recipe_with_gpt(raw_transcript):
-    if not raw_transcript or len(raw_transcript) < 50:
-        return "[]"
-
-    llm = ChatOpenAI(model="gpt-4o", temperature=0, api_key=api_key, base_url=api_base)
-
-    template = """
-    너는 요리 레시피를 정리하는 전문 에디터 AI야.
-    제공된 [자막]을 분석해서 불필요한 사담(인사, 맛 평가, 광고 등)은 모두 제거하고, 핵심 '요리 과정'만 추출해줘.
-
-    [작성 규칙]
-    1. 반드시 아래 예시와 같은 **순수 JSON 리스트 포맷**만 출력할 것. (Markdown 코드 블록 사용 금지)
-    2. 전체 구조는 객체들의 리스트(`[...]`)여야 한다.
-    3. 'step_title'은 해당 단계의 핵심 행동을 10글자 내외로 요약.
-    4. 'step_detail'은 구체적인 행동과 재료 손질법, 조리 시간을 포함하여 명확한 문장으로 서술.
-    5. 재료 손질 과정이 있다면 **반드시 1번 스텝**에 모아서 정리할 것.
-
-    [출력 예시]
-    [
-        {{"step": 1, "step_title": "재료 손질", "step_detail": "양파는 채 썰고 대파는 송송 썰어 준비합니다."}},
-        {{"step": 2, "step_title": "재료 볶기", "step_detail": "달궈진 팬에 식용유를 두르고 손질한 야채를 중불에서 볶습니다."}},
-        {{"step": 3, "step_title": "양념 하기", "step_detail": "간장 2스푼과 설탕 1스푼을 넣고 골고루 섞어줍니다."}}
-    ]
-
-    ---
-    [자막]
-    {transcript}
-    """
-    prompt = ChatPromptTemplate.from_template(template)
-    chain = prompt | llm
-    
-    try:
-        response = chain.invoke({"transcript": raw_transcript[:20000]})
-        clean_content = response.content.strip()
-        if clean_content.startswith("```"):
-            clean_content = clean_content.split("\n", 1)[1]
-            if clean_content.endswith("```"):
-                clean_content = clean_content.rsplit("\n", 1)[0]
-        return clean_content
-    except Exception as e:
-        print(f"GPT 에러: {e}")
-        return "[]"
-
-# [메인 실행]
-if __name__ == "__main__":
-    # 봇 탐지 우회 옵션 설정
+def create_driver():
+    """봇 탐지 우회 옵션이 적용된 Chrome 인스턴스 생성"""
     chrome_options = Options()
+    if SCRAPER_HEADLESS:
+        chrome_options.add_argument("--headless=new")
     chrome_options.add_argument("--mute-audio")
     chrome_options.add_argument("--window-size=1920,1080")
     chrome_options.add_argument("--disable-gpu")
     chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
     
     # ⭐ 봇 탐지 방지 핵심 옵션
     chrome_options.add_argument("--disable-blink-features=AutomationControlled")
@@ -174,43 +146,202 @@ if __name__ == "__main__":
     
     # navigator.webdriver 속성 숨기기 (봇 탐지 우회)
     driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+    return driver
 
-    print(f"🚀 총 {len(df)}개 영상 크롤링 시작...")
+def is_browser_crash(e):
+    msg = (getattr(e, 'msg', None) or str(e)).lower()
+    return any(k in msg for k in ('invalid session id', 'session deleted', 'disconnected', 'crashed', 'no such window', 'chrome not reachable'))
 
-    for index, row in df.iterrows():
-        url = row.get('video_url')
-        print(f"\n[{index+1}/{len(df)}] '{row.get('video_title', '제목없음')}' 진행 중...")
-        
-        if not url: continue
-
-        info = get_info_via_selenium(driver, url)
-        
-        gpt_result = "[]"
-        if info['transcript']:
-            print(f"   ✅ 자막 확보 성공! ({len(info['transcript'])}자) GPT 정리 요청...")
-            gpt_result = format_recipe_with_gpt(info['transcript'])
-        else:
-            print("   ❌ 자막 없음")
-
-        vid_id = get_video_id(url)
-        thumbnail_url = f"https://img.youtube.com/vi/{vid_id}/maxresdefault.jpg" if vid_id else ""
-
-        data = {
-            'recipe_video_id': row.get('recipe_video_id'),
-            'video_title': row.get('video_title'),
-            'video_url': url,
-            'thumbnail_url': thumbnail_url,
-            'view_count': info['view_count'],
-            'duration': info['duration'],
-            'steps_json': gpt_result
-        }
-        
-        df_save = pd.DataFrame([data])
-        
-        if not os.path.exists(OUTPUT_FILE):
-            df_save.to_csv(OUTPUT_FILE, index=False, mode='w', encoding='utf-8-sig')
+# 브라우저 워커마다 자기 브라우저를 꺼내는 함수 (browser 단계에서 사용)
+_worker = threading.local()
+
+def browser_tier(video_id, url):
+    """자막 확보 마지막 단계: 싼 방법이 모두 실패한 영상만 브라우저를 띄워서 시도"""
+    return get_info_via_selenium(_worker.get_driver(), url)['segments']
+
+def scrape_row(row, chain, manifest):
+    """
+    영상 하나 처리 (조회수 → 자막 크롤링) 후 (저장할 행, GPT 정리가 필요한 자막 or None) 반환.
+    체크포인트(manifest)에 끝난 단계는 건너뛰고, 브라우저는 자막이 필요할 때만 띄웁니다.
+    """
+    rid = row.get('recipe_video_id')
+    url = row.get('video_url')
+    vid_id = get_video_id(url)
+    entry = manifest.entry(rid)
+
+    thumbnail_url = f"https://img.youtube.com/vi/{vid_id}/maxresdefault.jpg" if vid_id else ""
+
+    # 1. API로 조회수 가져오기 (실패해도 크롤링은 계속)
+    if manifest.is_done(rid, 'stats'):
+        view_count, duration = entry['view_count'], entry['duration']
+    else:
+        with telemetry.stage('stats'):
+            stats = get_video_stats(vid_id) if vid_id else (0, "0:00")
+        if stats is None:
+            # 할당량 소진 / API 장애: 영상 문제가 아니므로 체크포인트에 기록하지 않음 (다음 실행에서 다시 조회)
+            view_count, duration = 0, "0:00"
         else:
-            df_save.to_csv(OUTPUT_FILE, index=False, mode='a', header=False, encoding='utf-8-sig')
+            view_count, duration = stats
+            # 제목/썸네일도 같이 저장 (whisper 가 이 체크포인트로 행을 다시 만들 때 사용)
+            manifest.mark(rid, 'stats', duration != "0:00", view_count=view_count, duration=duration,
+                          video_title=row.get('video_title'), thumbnail_url=thumbnail_url)
+
+    # 2. 자막: 이전 실행에서 받아 둔 자막 → transcript API → yt-dlp 자막 → 브라우저 순서
+    transcript = manifest.load_transcript(rid)
+    if transcript is None and manifest.should_run(rid, 'transcript'):
+        with telemetry.stage('transcript'):
+            segments, tier = chain.fetch(vid_id, url)
+        transcript = compact_segments(segments, dedupe=tier in ROLLING_TIERS) if segments else None
+        if transcript:
+            print(f"   📝 자막 확보 ({tier})")
+            manifest.save_transcript(rid, transcript)
+        manifest.mark(rid, 'transcript', bool(transcript), error=None if transcript else "자막 없음", transcript_tier=tier)
+
+    # 3. GPT 조리 과정 정리는 브라우저를 붙잡지 않도록 step_extractor 풀에서 따로 처리
+    pending = None
+    if transcript and manifest.should_run(rid, 'steps'):
+        print(f"   ✅ 자막 확보 성공! ({len(transcript)}자) GPT 정리 요청...")
+        pending = transcript
+    elif not transcript:
+        print(f"   ❌ 자막 없음 ({url})")
+
+    return {
+        'recipe_video_id': rid,
+        'video_title': row.get('video_title'),
+        'video_url': url,
+        'thumbnail_url': thumbnail_url,
+        'view_count': view_count,
+        'duration': duration,
+        'steps_json': entry.get('steps_json', "[]")
+    }, pending
+
+def extract_and_save(data, transcript, manifest, result_queue):
+    """GPT로 조리 과정을 뽑아 체크포인트에 기록하고 writer로 넘김 (step_extractor 풀에서 실행)"""
+    gpt_result = get_extractor().extract(transcript)
+    steps, status, _ = parse_steps_json(gpt_result)
+    manifest.mark(data['recipe_video_id'], 'steps', bool(steps), error=None if steps else status, steps_json=gpt_result)
+    data['steps_json'] = gpt_result
+    result_queue.put(data)
+
+def browser_worker(worker_id, work_queue, result_queue, chain, manifest):
+    """
+    브라우저 하나를 들고 작업 큐에서 영상을 꺼내 처리.
+    브라우저가 죽으면 새로 띄우고 해당 영상을 다시 시도합니다.
+    """
+    driver = None
+
+    def get_driver():
+        nonlocal driver
+        if driver is None:
+            driver = create_driver()
+        return driver
+
+    _worker.get_driver = get_driver
+    try:
+        while True:
+            item = work_queue.get()
+            if item is None:
+                break
+            index, row = item
+            print(f"\n[W{worker_id}] [{index+1}/{len(df)}] '{row.get('video_title', '제목없음')}' 진행 중...")
+
+            for attempt in range(BROWSER_MAX_RESTARTS + 1):
+                try:
+                    data, pending = scrape_row(row, chain, manifest)
+                    if pending:
+                        get_extractor().pool.submit(extract_and_save, data, pending, manifest, result_queue)
+                    else:
+                        result_queue.put(data)
+                    break
+                except WebDriverException as e:
+                    print(f"   💥 [W{worker_id}] 브라우저 오류, 재시작합니다: {getattr(e, 'msg', e)}")
+                    try:
+                        if driver: driver.quit()
+                    except Exception:
+                        pass
+                    driver = None
+                except Exception as e:
+                    print(f"   ❌ [{index+1}] 처리 실패: {e}")
+                    telemetry.tick(ok=False)
+                    break
+            else:
+                print(f"   ❌ [{index+1}] 브라우저 재시작 후에도 실패 (건너뜀)")
+                telemetry.tick(ok=False)
+    finally:
+        if driver:
+            driver.quit()
+
+def csv_writer(result_queue):
+    """결과를 한 곳에서만 CSV에 쓰기 (여러 워커가 동시에 써서 줄이 섞이지 않도록)"""
+    # 같은 recipe_video_id가 다시 오면(재시도) 기존 행을 교체해서 중복 저장 방지
+    writer = DedupCsvWriter(OUTPUT_FILE)
+    while True:
+        data = result_queue.get()
+        if data is None:
+            break
+        writer.write(data)
+        telemetry.tick(ok=data.get('steps_json') not in (None, "[]"))
+
+# [메인 실행]
+if __name__ == "__main__":
+    print(f"🚀 총 {len(df)}개 영상 크롤링 시작... (브라우저 {SCRAPER_WORKERS}개)")
+
+    work_queue = queue.Queue()
+    result_queue = queue.Queue()
+    limiter = DomainRateLimiter(SCRAPER_MIN_INTERVAL, SCRAPER_JITTER)
+    manifest = Manifest(MANIFEST_FILE)
+    # 요청 간격(limiter)은 자막 단계마다 적용, 브라우저가 죽은 경우만 워커로 올려서 재시작
+    chain = TranscriptChain(cheap_tiers() + [('browser', browser_tier)], limiter=limiter, reraise=(WebDriverException,))
+
+    # 체크포인트 기준으로 모든 단계가 끝난 영상은 건너뜀 (실패한 단계가 있는 영상만 다시 처리)
+    skipped = 0
+    for index, row in df.iterrows():
+        if not row.get('video_url') or pd.isna(row.get('video_url')): continue
+        if pd.isna(row.get('recipe_video_id')): continue
+        if not manifest.needs_work(row['recipe_video_id']):
+            skipped += 1
+            continue
+        work_queue.put((index, row))
+    print(f"⏭️ 이미 처리된 영상 {skipped}개 건너뜀, {work_queue.qsize()}개 처리 예정")
+
+    telemetry.start_run('scraper', total=work_queue.qsize())
+
+    # 조회수/재생시간은 50개씩 묶어서 미리 조회 (캐시에 있으면 API 호출 없음)
+    # 체크포인트에 이미 조회수가 있는 영상은 scrape_row 에서도 쓰지 않으므로 제외 (할당량 절약)
+    prefetch_ids = [get_video_id(row['video_url']) for _, row in list(work_queue.queue)
+                    if not manifest.is_done(row['recipe_video_id'], 'stats')]
+    with telemetry.stage('stats_prefetch'):
+        get_videos_stats([vid for vid in prefetch_ids if vid])
+
+    writer = threading.Thread(target=csv_writer, args=(result_queue,))
+    writer.start()
+
+    workers = [threading.Thread(target=browser_worker, args=(i + 1, work_queue, result_queue, chain, manifest)) for i in range(SCRAPER_WORKERS)]
+    for w in workers:
+        w.start()
+        work_queue.put(None)
+
+    for w in workers:
+        w.join()
+    # 남은 GPT 요청이 다 끝나고 결과가 큐에 들어간 뒤에 writer 종료
+    extractor = get_extractor()
+    extractor.shutdown()
+    result_queue.put(None)
+    writer.join()
+
+    print(f"🤖 GPT 조리 과정 추출: 요청 {extractor.stats['requested']}건 / 캐시 {extractor.stats['cached']}건 / 실패 {extractor.stats['failed']}건")
+    openai_client.print_usage()
+    for tier, counts in chain.summary().items():
+        print(f"📝 자막({tier}): 성공 {counts['ok']}개 / 실패 {counts['failed']}개")
+    for stage, counts in manifest.summary().items():
+        print(f"📊 {stage}: 성공 {counts['done']}개 / 실패 {counts['failed']}개")
+    telemetry.note('transcript_tiers', chain.summary())
+    telemetry.note('manifest', manifest.summary())
+    telemetry.note('step_extractor', extractor.stats)
+    telemetry.finish()
+
+    # DATA_FORMAT=parquet: 한 줄씩 쌓은 CSV를 타입이 고정된 Parquet 스냅샷으로 변환
+    if DATA_FORMAT == 'parquet' and os.path.exists(OUTPUT_FILE):
+        print(f"💾 Parquet 스냅샷 저장: {write_scraper_parquet(OUTPUT_FILE)}")
 
     print("\n🎉 완료! data 폴더를 확인하세요.")
-    driver.quit()
\ No newline at end of file
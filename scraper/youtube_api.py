@@ -1,51 +1,174 @@
 # youtube_api.py
 import os
+import json
+import time
+import random
+import threading
 import requests
 import isodate
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
 load_dotenv()
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 
+API_URL = "https://www.googleapis.com/youtube/v3/videos"
 
-def get_video_stats(video_id):
+# videos 엔드포인트는 한 번에 최대 50개 id 조회 가능
+BATCH_SIZE = 50
+MAX_RETRIES = 5
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_FILE = os.path.join(BASE_DIR, 'data', 'youtube_stats_cache.json')
+# 캐시 유효 시간 (시간 단위, 기본 24시간)
+CACHE_TTL = float(os.getenv("YOUTUBE_CACHE_TTL_HOURS", "24")) * 3600
+
+# 커넥션을 재사용하는 세션 (여러 스레드에서 같이 사용)
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+# 할당량이 한 번 소진되면 이 프로세스에서는 더 이상 API를 호출하지 않음 (캐시만 사용)
+_quota_exhausted = threading.Event()
+
+
+class QuotaExceededError(Exception):
+    """일일 할당량 소진 (재시도해도 소용없음)"""
+
+
+def format_duration(duration_iso):
+    """ISO 8601 재생시간 → 사람이 보는 포맷 (mm:ss or h:mm:ss)"""
+    td = isodate.parse_duration(duration_iso)
+    total = int(td.total_seconds())
+
+    h = total // 3600
+    m = (total % 3600) // 60
+    s = total % 60
+
+    return f"{h}:{m:02d}:{s:02d}" if h else f"{m}:{s:02d}"
+
+
+def _load_cache():
+    global _cache
+    if _cache is None:
+        _cache = {}
+        if os.path.exists(CACHE_FILE):
+            try:
+                with open(CACHE_FILE, encoding='utf-8') as f:
+                    _cache = json.load(f)
+            except (OSError, ValueError):
+                _cache = {}
+    return _cache
+
+
+def _save_cache():
+    os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+    tmp_path = CACHE_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(_cache, f, ensure_ascii=False)
+    os.replace(tmp_path, CACHE_FILE)
+
+
+def _request_batch(video_ids):
     """
-    return:
-      view_count (int),
-      duration (str, mm:ss or hh:mm:ss)
+    id 최대 50개를 한 번에 조회.
+    rateLimitExceeded / 429 / 5xx 는 지수 백오프로 재시도하고, quotaExceeded 는 바로 중단합니다.
     """
-    url = "https://www.googleapis.com/youtube/v3/videos"
     params = {
         "part": "statistics,contentDetails",
-        "id": video_id,
+        "id": ",".join(video_ids),
         "key": YOUTUBE_API_KEY
     }
 
-    try:
-        res = requests.get(url, params=params, timeout=10)
-        data = res.json()
+    for attempt in range(MAX_RETRIES):
+        res = _session.get(API_URL, params=params, timeout=10)
+        if res.status_code == 200:
+            return res.json().get("items", [])
+
+        reasons = set()
+        try:
+            reasons = {e.get("reason") for e in res.json().get("error", {}).get("errors", [])}
+        except ValueError:
+            pass
+
+        if "quotaExceeded" in reasons or "dailyLimitExceeded" in reasons:
+            raise QuotaExceededError("YouTube API 일일 할당량 소진")
+
+        retryable = res.status_code in (429, 500, 503) or reasons & {"rateLimitExceeded", "userRateLimitExceeded"}
+        if not retryable:
+            res.raise_for_status()
 
-        if not data.get("items"):
-            return 0, "0:00"
+        wait = min(2 ** attempt, 30) + random.uniform(0, 1)
+        print(f"⚠️ YouTube API 제한 ({res.status_code}), {wait:.1f}초 후 재시도...")
+        time.sleep(wait)
 
-        item = data["items"][0]
+    res.raise_for_status()
+    return []
 
-        # 조회수 (⭐ 숫자)
-        view_count = int(item["statistics"].get("viewCount", 0))
 
-        # 재생시간 (ISO → 사람이 보는 포맷)
-        duration_iso = item["contentDetails"]["duration"]
-        td = isodate.parse_duration(duration_iso)
-        total = int(td.total_seconds())
+def get_videos_stats(video_ids):
+    """
+    여러 영상의 (조회수, 재생시간)을 50개씩 묶어서 조회.
+    디스크 캐시(TTL)에 있는 영상은 API를 호출하지 않습니다.
+    return: {video_id: (view_count, duration)}
+            할당량 소진 / API 실패로 조회하지 못한 영상은 결과에 없음 (호출한 쪽에서 실패로 기록하지 않도록)
+    """
+    now = time.time()
+    results = {}
 
-        h = total // 3600
-        m = (total % 3600) // 60
-        s = total % 60
+    with _cache_lock:
+        cache = _load_cache()
+        missing = []
+        for vid in dict.fromkeys(v for v in video_ids if v):
+            entry = cache.get(vid)
+            if entry and now - entry["fetched_at"] < CACHE_TTL:
+                results[vid] = (entry["view_count"], entry["duration"])
+            else:
+                missing.append(vid)
 
-        duration = f"{h}:{m:02d}:{s:02d}" if h else f"{m}:{s:02d}"
+    if not missing or _quota_exhausted.is_set():
+        return results
 
-        return view_count, duration
+    fetched = {}
+    try:
+        for i in range(0, len(missing), BATCH_SIZE):
+            batch = missing[i:i + BATCH_SIZE]
+            items = {item["id"]: item for item in _request_batch(batch)}
 
+            for vid in batch:
+                item = items.get(vid)
+                if item is None:
+                    # 삭제/비공개 영상도 캐시해서 다시 조회하지 않음
+                    fetched[vid] = (0, "0:00")
+                    continue
+                view_count = int(item["statistics"].get("viewCount", 0))
+                duration = format_duration(item["contentDetails"]["duration"])
+                fetched[vid] = (view_count, duration)
+
+    except QuotaExceededError as e:
+        _quota_exhausted.set()
+        print(f"⚠️ {e} - 남은 {len(missing) - len(fetched)}개 영상은 다음 실행에서 조회합니다. (이번 실행에서는 더 이상 호출하지 않음)")
     except Exception as e:
         print("⚠️ YouTube API 실패:", e)
-        return 0, "0:00"
\ No newline at end of file
+
+    with _cache_lock:
+        cache = _load_cache()
+        for vid, (view_count, duration) in fetched.items():
+            cache[vid] = {"view_count": view_count, "duration": duration, "fetched_at": now}
+        if fetched:
+            _save_cache()
+
+    results.update(fetched)
+    return results
+
+
+def get_video_stats(video_id):
+    """
+    return:
+      view_count (int),
+      duration (str, mm:ss or hh:mm:ss)
+      할당량 소진 / API 실패로 조회하지 못하면 None
+    """
+    return get_videos_stats([video_id]).get(video_id)
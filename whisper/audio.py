@@ -0,0 +1,126 @@
+"""
+Whisper 변환용 오디오 처리
+
+1. bestaudio 다운로드 (재인코딩 없이 원본 그대로)
+2. ffmpeg 로 mono / 16kHz / 저비트레이트 mp3 변환 (음성 인식에는 충분하고 업로드 용량이 크게 줄어듦)
+3. silencedetect 로 무음 구간을 찾아 WHISPER_CHUNK_SECONDS 이하 조각으로 분할
+4. 조각들을 동시에 Whisper(verbose_json)로 변환하고, 조각 시작 시간만큼 타임스탬프를 밀어서 이어 붙임
+
+임시 파일은 영상마다 tempfile.mkdtemp() 로 만든 폴더에 두고 끝나면 폴더째 삭제합니다.
+"""
+import os
+import re
+import shutil
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import yt_dlp
+
+from common import openai_client, telemetry
+
+WHISPER_CHUNK_SECONDS = float(os.getenv("WHISPER_CHUNK_SECONDS", "600"))  # 조각 최대 길이(초)
+WHISPER_WORKERS = int(os.getenv("WHISPER_WORKERS", "4"))                  # 동시에 변환할 조각 수
+WHISPER_BITRATE = os.getenv("WHISPER_BITRATE", "32k")
+
+SILENCE_NOISE = "-35dB"   # 이보다 작은 소리를 무음으로 봄
+SILENCE_MIN = 0.4         # 이 시간(초) 이상 이어지면 무음 구간
+
+SILENCE_START_RE = re.compile(r"silence_start: (-?[\d.]+)")
+SILENCE_END_RE = re.compile(r"silence_end: (-?[\d.]+)")
+DURATION_RE = re.compile(r"Duration: (\d+):(\d+):([\d.]+)")
+
+
+def _ffmpeg(*args):
+    """ffmpeg 실행 후 stderr 반환 (로그/분석 결과가 stderr 로 나옴)"""
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-nostdin", "-y", *args], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg 실패: {result.stderr.strip()[-300:]}")
+    return result.stderr
+
+
+def download_audio(video_url, workdir):
+    ydl_opts = {
+        'format': 'bestaudio/best',
+        'outtmpl': os.path.join(workdir, 'source.%(ext)s'),
+        'quiet': True,
+        'no_warnings': True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(video_url, download=True)
+        return ydl.prepare_filename(info)
+
+
+def to_speech_mp3(src, workdir):
+    """mono / 16kHz / 저비트레이트 mp3 로 변환"""
+    out = os.path.join(workdir, 'speech.mp3')
+    _ffmpeg("-i", src, "-vn", "-ac", "1", "-ar", "16000", "-b:a", WHISPER_BITRATE, out)
+    return out
+
+
+def detect_silences(path):
+    """return: (전체 길이(초), [(무음 시작, 무음 끝), ...])"""
+    log = _ffmpeg("-i", path, "-af", f"silencedetect=noise={SILENCE_NOISE}:d={SILENCE_MIN}", "-f", "null", "-")
+
+    m = DURATION_RE.search(log)
+    duration = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3)) if m else 0.0
+
+    starts = [float(x) for x in SILENCE_START_RE.findall(log)]
+    ends = [float(x) for x in SILENCE_END_RE.findall(log)]
+    return duration, list(zip(starts, ends))
+
+
+def plan_chunks(duration, silences, max_len=WHISPER_CHUNK_SECONDS):
+    """
+    max_len 을 넘지 않는 범위에서 가장 늦은 무음 구간 가운데에서 자름.
+    그 사이에 무음이 없으면 max_len 에서 그냥 자릅니다.
+    return: [(시작, 끝), ...]
+    """
+    cuts = [(s + e) / 2 for s, e in silences if 0 < (s + e) / 2 < duration]
+    chunks, start = [], 0.0
+    while duration - start > max_len:
+        candidates = [c for c in cuts if start + 1.0 < c <= start + max_len]
+        end = candidates[-1] if candidates else start + max_len
+        chunks.append((start, end))
+        start = end
+    chunks.append((start, duration))
+    return chunks
+
+
+def cut_chunk(src, start, end, out):
+    _ffmpeg("-ss", f"{start:.3f}", "-to", f"{end:.3f}", "-i", src, "-c", "copy", out)
+    return out
+
+
+def _transcribe_chunk(path, offset):
+    result = openai_client.transcribe(path, model="whisper-1", language="ko", response_format="verbose_json")
+    if not result['segments']:
+        return [{'start': offset, 'text': result['text']}] if result['text'].strip() else []
+    return [{'start': offset + seg['start'], 'text': seg['text']} for seg in result['segments']]
+
+
+def transcribe_video(video_url):
+    """
+    영상 오디오 → Whisper segments([{'start': 초, 'text': str}, ...]).
+    실패하면 예외를 그대로 올림 (호출한 쪽에서 다음 단계로 처리)
+    """
+    workdir = tempfile.mkdtemp(prefix="whisper_")
+    try:
+        with telemetry.stage('audio_download'):
+            source = download_audio(video_url, workdir)
+        with telemetry.stage('audio_prep'):
+            speech = to_speech_mp3(source, workdir)
+            duration, silences = detect_silences(speech)
+            chunks = plan_chunks(duration, silences)
+
+            if len(chunks) == 1:
+                paths = [speech]
+            else:
+                paths = [cut_chunk(speech, s, e, os.path.join(workdir, f"chunk_{i:03d}.mp3")) for i, (s, e) in enumerate(chunks)]
+        print(f"      🎧 오디오 {duration / 60:.1f}분 → {len(paths)}개 조각 변환 중...")
+
+        with telemetry.stage('whisper_api'), ThreadPoolExecutor(max_workers=max(1, min(WHISPER_WORKERS, len(paths)))) as pool:
+            results = pool.map(_transcribe_chunk, paths, [s for s, _ in chunks])
+            return [seg for part in results for seg in part]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -1,12 +1,11 @@
 import os
+import sys
 import time
 import json
 import random
-import requests
 import pandas as pd
 import yt_dlp
 from dotenv import load_dotenv
-from openai import OpenAI
 
 # 1. 현재 파일(main.py)의 위치를 기준으로 경로 설정 (가장 안전함)
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__)) # whisper 폴더
@@ -17,167 +16,123 @@ ENV_PATH = os.path.join(BASE_DIR, '.env')              # .env 파일
 # .env 로드
 load_dotenv(dotenv_path=ENV_PATH)
 
-# API 키 확인
-api_key = os.getenv("OPENAI_API_KEY")
-api_base = os.getenv("OPENAI_API_BASE")
-
-if not api_key:
+sys.path.append(BASE_DIR)
+from common.table_io import DATA_FORMAT, write_scraper_parquet, DedupCsvWriter
+from common.manifest import Manifest
+from common.steps_json import parse_steps_json
+from common.step_extractor import get_extractor
+from common.transcripts import TranscriptChain, fetch_transcript_api, fetch_ytdlp_subtitles, LANGUAGES
+from common.transcript_prep import compact_segments, ROLLING_TIERS
+from common import openai_client, telemetry
+from audio import transcribe_video
+
+# API 키 확인 (OPENAI_MODE=replay 면 녹화된 응답만 쓰므로 키 불필요)
+if not openai_client.has_credentials():
     print("⚠️ 오류: .env 파일에 OPENAI_API_KEY가 없습니다.")
     exit()
 
-client = OpenAI(api_key=api_key.strip(), base_url=api_base)
-
 # 입력/출력 파일 경로 (절대 경로 사용)
 INPUT_CSV = os.path.join(DATA_DIR, 'recipes_data.csv')
 OUTPUT_CSV = os.path.join(DATA_DIR, 'recipes_scraper.csv')
+# scraper와 같은 체크포인트를 공유 (scraper에서 자막을 못 구한 영상만 여기서 다시 시도)
+MANIFEST_FILE = os.path.join(DATA_DIR, 'scrape_manifest.json')
 
-def download_json_subtitles(url):
-    """유튜브 자막 URL(JSON3 포맷)을 텍스트로 변환"""
-    try:
-        res = requests.get(url)
-        data = res.json()
-        full_text = ""
-        for event in data.get('events', []):
-            if 'segs' in event:
-                for seg in event['segs']:
-                    if 'utf8' in seg:
-                        full_text += seg['utf8'] + " "
-        return full_text.strip()
-    except Exception:
-        return None
-
-def transcribe_audio_with_whisper(video_url):
-    """자막 없을 때 Whisper로 변환"""
-    print("      🎤 자막 없음! Whisper 변환 시도...")
-    # 임시 파일도 data 폴더에 저장 (권한 문제 방지)
-    temp_audio = os.path.join(DATA_DIR, f"temp_{int(time.time())}")
-    
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': temp_audio,
-        'postprocessors': [{'key': 'FFmpegExtractAudio','preferredcodec': 'mp3','preferredquality': '128'}],
-        'quiet': True,
-        'no_warnings': True,
-    }
+# process_video 에서 이미 조회한 yt-dlp 정보 (ytdlp 단계에서 다시 조회하지 않도록)
+_info_cache = {}
 
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([video_url])
-        
-        mp3_filename = temp_audio + ".mp3"
-        
-        with open(mp3_filename, "rb") as audio_file:
-            transcript = client.audio.transcriptions.create(
-                model="whisper-1", file=audio_file, language="ko"
-            )
-        
-        if os.path.exists(mp3_filename): os.remove(mp3_filename)
-        return transcript.text
-    except Exception as e:
-        print(f"      ❌ Whisper 실패: {e}")
-        # 실패 시 잔여 파일 삭제
-        if os.path.exists(temp_audio + ".mp3"): os.remove(temp_audio + ".mp3")
-        return ""
-
-def summarize_with_gpt(text):
-    """텍스트를 받아 요리 순서 JSON List로 변환"""
-    if not text or len(text) < 50: return "[]"
-    
-    template = """
-    너는 요리 레시피를 정리하는 전문 에디터 AI야.
-    제공된 [자막]을 분석해서 불필요한 사담(인사, 맛 평가, 광고 등)은 모두 제거하고, 핵심 '요리 과정'만 추출해줘.
-
-    [작성 규칙]
-    1. 반드시 아래 예시와 같은 **순수 JSON 리스트 포맷**만 출력할 것. (Markdown 코드 블록 사용 금지)
-    2. 전체 구조는 객체들의 리스트(`[...]`)여야 한다.
-    3. 'step_title'은 해당 단계의 핵심 행동을 10글자 내외로 요약.
-    4. 'step_detail'은 구체적인 행동과 재료 손질법, 조리 시간을 포함하여 명확한 문장으로 자세하게 서술.
-    5. 재료 손질 과정이 있다면 **반드시 1번 스텝**에 모아서 정리할 것.
-
-    [출력 예시]
-    [
-        {{"step": 1, "step_title": "재료 손질", "step_detail": "양파는 채 썰고 대파는 송송 썰어 준비합니다."}},
-        {{"step": 2, "step_title": "재료 볶기", "step_detail": "달궈진 팬에 식용유를 두르고 손질한 야채를 중불에서 볶습니다."}},
-        {{"step": 3, "step_title": "양념 하기", "step_detail": "간장 2스푼과 설탕 1스푼을 넣고 골고루 섞어줍니다."}}
-    ]
-
-    ---
-    [자막]
-    {transcript}
-    """
-    
-    formatted_prompt = template.format(transcript=text[:25000])
-
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": formatted_prompt}],
-            temperature=0
-        )
-        
-        content = response.choices[0].message.content.strip()
+def ytdlp_tier(video_id, video_url):
+    return fetch_ytdlp_subtitles(video_id, video_url, info=_info_cache.get(video_url))
 
-        if content.startswith("```"):
-            content = content.split("\n", 1)[1]
-            if content.endswith("```"):
-                content = content.rsplit("\n", 1)[0]
-        
-        return content.strip()
-        
-    except Exception as e:
-        print(f"      ⚠️ GPT 요약 실패: {e}")
-        return "[]"
+def whisper_tier(video_id, video_url):
+    """자막 확보 마지막 단계: 자막이 전혀 없는 영상만 오디오를 받아서 변환 (whisper/audio.py)"""
+    print("      🎤 자막 없음! Whisper 변환 시도...")
+    return transcribe_video(video_url)
+
+# transcript API → yt-dlp 자막 → Whisper 순서로 시도
+chain = TranscriptChain([('transcript_api', fetch_transcript_api), ('ytdlp', ytdlp_tier), ('whisper', whisper_tier)])
 
-def process_video(video_url, recipe_video_id):
+def process_video(video_url, recipe_video_id, manifest, video_title=None):
+    """
+    체크포인트(manifest)에 끝난 단계(영상 정보/자막)는 건너뛰고 나머지만 처리.
+    체크포인트에 제목/썸네일이 없으면(이전 버전 scraper 가 기록한 영상) 영상 정보는 다시 조회합니다.
+    return: (저장할 행, GPT 정리가 필요한 자막 or None)
+    """
     ydl_opts = {
         'skip_download': True,
         'writesubtitles': True,
         'writeautomaticsub': True,
-        'subtitleslangs': ['ko', 'en'],
+        'subtitleslangs': LANGUAGES,
+        'subtitlesformat': 'json3',
         'quiet': True,
         'no_warnings': True,
     }
 
-    transcript_text = ""
+    entry = manifest.entry(recipe_video_id)
     video_data = {
         'recipe_video_id': recipe_video_id,
-        'video_title': None,
+        'video_title': entry.get('video_title') or video_title,
         'video_url': video_url,
-        'thumbnail_url': None,
-        'view_count': 0,
-        'duration': "0:00",
-        'steps_json': "[]"
+        'thumbnail_url': entry.get('thumbnail_url'),
+        'view_count': entry.get('view_count', 0),
+        'duration': entry.get('duration', "0:00"),
+        'steps_json': entry.get('steps_json', "[]")
     }
 
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(video_url, download=False)
-            
-            video_data['video_title'] = info.get('title')
-            video_data['thumbnail_url'] = info.get('thumbnail')
-            video_data['view_count'] = info.get('view_count')
-            video_data['duration'] = info.get('duration_string')
-
-            captions = info.get('requested_subtitles')
-            if captions:
-                sub_url = captions.get('ko', {}).get('url')
-                if not sub_url: sub_url = captions.get('en', {}).get('url')
-                if sub_url: transcript_text = download_json_subtitles(sub_url)
-
-    except Exception as e:
-        print(f"   ⚠️ yt-dlp 에러: {e}")
-        return None
-
+    # 이전 실행에서 받아 둔 자막이 있으면 재사용
+    transcript_text = manifest.load_transcript(recipe_video_id) or ""
+    need_transcript = not transcript_text and manifest.should_run(recipe_video_id, 'transcript')
+
+    need_info = not (entry.get('video_title') and entry.get('thumbnail_url'))
+
+    if manifest.should_run(recipe_video_id, 'stats') or need_transcript or need_info:
+        try:
+            with telemetry.stage('info'), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info = ydl.extract_info(video_url, download=False)
+                
+                # 실제로 받아 온 값만 덮어씀 (없는 값으로 기존 행을 지우지 않도록)
+                fetched = {
+                    'video_title': info.get('title'),
+                    'thumbnail_url': info.get('thumbnail'),
+                    'view_count': info.get('view_count'),
+                    'duration': info.get('duration_string'),
+                }
+                video_data.update({k: v for k, v in fetched.items() if v is not None})
+                if manifest.should_run(recipe_video_id, 'stats') or need_info:
+                    manifest.mark(recipe_video_id, 'stats', True, **{k: video_data[k] for k in ('video_title', 'thumbnail_url', 'view_count', 'duration')})
+
+        except Exception as e:
+            print(f"   ⚠️ yt-dlp 에러: {e}")
+            if not manifest.is_done(recipe_video_id, 'stats'):
+                manifest.mark(recipe_video_id, 'stats', False, error=e)
+            return None, None
+
+    if need_transcript:
+        _info_cache[video_url] = info
+        try:
+            with telemetry.stage('transcript'):
+                segments, tier = chain.fetch(info.get('id'), video_url)
+        finally:
+            _info_cache.pop(video_url, None)
+        transcript_text = compact_segments(segments, dedupe=tier in ROLLING_TIERS) if segments else ""
+        if transcript_text:
+            print(f"      📝 자막 확보 ({tier})")
+            manifest.save_transcript(recipe_video_id, transcript_text)
+        manifest.mark(recipe_video_id, 'transcript', bool(transcript_text), error=None if transcript_text else "자막/오디오 추출 실패", transcript_tier=tier)
+
+    if transcript_text and manifest.should_run(recipe_video_id, 'steps'):
+        print(f"      ✅ 자막 확보! ({len(transcript_text)}자) GPT 요약 요청...")
+        return video_data, transcript_text
     if not transcript_text:
-        transcript_text = transcribe_audio_with_whisper(video_url)
-
-    if transcript_text:
-        print(f"      ✅ 자막 확보! ({len(transcript_text)}자) GPT 요약 중...")
-        steps_json = summarize_with_gpt(transcript_text)
-        video_data['steps_json'] = steps_json
-    else:
         print("      ❌ 자막/오디오 추출 실패")
 
+    return video_data, None
+
+def finish_steps(video_data, future, manifest):
+    """GPT 요약 결과를 행과 체크포인트에 반영"""
+    steps_json = future.result()
+    steps, status, _ = parse_steps_json(steps_json)
+    manifest.mark(video_data['recipe_video_id'], 'steps', bool(steps), error=None if steps else status, steps_json=steps_json)
+    video_data['steps_json'] = steps_json
     return video_data
 
 if __name__ == "__main__":
@@ -189,25 +144,64 @@ if __name__ == "__main__":
         print("💡 data 폴더에 recipes_data.csv 파일을 넣어주세요.")
         exit()
 
-    for idx, row in df.iterrows():
+    manifest = Manifest(MANIFEST_FILE)
+    writer = DedupCsvWriter(OUTPUT_CSV)
+    extractor = get_extractor()
+    # GPT 요약은 다음 영상을 처리하는 동안 백그라운드에서 진행 (저장은 메인 스레드에서만)
+    pending = []
+
+    def flush(wait=False):
+        for item in list(pending):
+            video_data, future = item
+            if wait or future.done():
+                video_data = finish_steps(video_data, future, manifest)
+                writer.write(video_data)
+                telemetry.tick(ok=video_data['steps_json'] != "[]")
+                pending.remove(item)
+                print(f"   ✅ 저장 완료! ({video_data['recipe_video_id']})")
+
+    # 모든 단계가 끝난 영상은 건너뜀
+    todo = [(idx, row) for idx, row in df.iterrows()
+            if row.get('video_url') and not pd.isna(row.get('video_url')) and not pd.isna(row.get('recipe_video_id'))
+            and manifest.needs_work(row.get('recipe_video_id'))]
+    telemetry.start_run('whisper', total=len(todo))
+
+    for idx, row in todo:
         url = row.get('video_url')
         rec_id = row.get('recipe_video_id')
-        
-        if not url or pd.isna(url): continue
-            
+
         print(f"\n▶️ [{idx+1}/{len(df)}] 처리 중: {row.get('video_title', '제목없음')}")
         
-        data = process_video(url, rec_id)
+        data, transcript_text = process_video(url, rec_id, manifest, video_title=row.get('video_title'))
         
-        if data:
-            df_save = pd.DataFrame([data])
-            if not os.path.exists(OUTPUT_CSV):
-                df_save.to_csv(OUTPUT_CSV, index=False, mode='w', encoding='utf-8-sig')
-            else:
-                df_save.to_csv(OUTPUT_CSV, index=False, mode='a', header=False, encoding='utf-8-sig')
-            
+        if data and transcript_text:
+            pending.append((data, extractor.submit(transcript_text)))
+        elif data:
+            writer.write(data)
+            telemetry.tick(ok=data['steps_json'] != "[]")
             print("   ✅ 저장 완료!")
+        else:
+            telemetry.tick(ok=False)
+        flush()
         
         time.sleep(random.uniform(5, 10))
 
+    flush(wait=True)
+    extractor.shutdown()
+    print(f"🤖 GPT 조리 과정 추출: 요청 {extractor.stats['requested']}건 / 캐시 {extractor.stats['cached']}건 / 실패 {extractor.stats['failed']}건")
+    openai_client.print_usage()
+
+    for tier, counts in chain.summary().items():
+        print(f"📝 자막({tier}): 성공 {counts['ok']}개 / 실패 {counts['failed']}개")
+    for stage, counts in manifest.summary().items():
+        print(f"📊 {stage}: 성공 {counts['done']}개 / 실패 {counts['failed']}개")
+    telemetry.note('transcript_tiers', chain.summary())
+    telemetry.note('manifest', manifest.summary())
+    telemetry.note('step_extractor', extractor.stats)
+    telemetry.finish()
+
+    # DATA_FORMAT=parquet: 한 줄씩 쌓은 CSV를 타입이 고정된 Parquet 스냅샷으로 변환
+    if DATA_FORMAT == 'parquet' and os.path.exists(OUTPUT_CSV):
+        print(f"💾 Parquet 스냅샷 저장: {write_scraper_parquet(OUTPUT_CSV)}")
+
     print(f"\n🎉 작업 완료! '{OUTPUT_CSV}' 확인.")
\ No newline at end of file
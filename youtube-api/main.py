@@ -1,27 +1,33 @@
 import os
-import time
+import sys
 import pandas as pd
 import json
-import random
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, ALL_COMPLETED, wait
 from dotenv import load_dotenv
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api._errors import TranscriptsDisabled, NoTranscriptFound, VideoUnavailable
-from openai import OpenAI
 
 load_dotenv()
 
-api_key = os.getenv("OPENAI_API_KEY")
-api_base = os.getenv("OPENAI_API_BASE")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.transcripts import TranscriptChain, cheap_tiers
+from common.transcript_prep import format_with_timestamps, split_by_tokens, ROLLING_TIERS
+from common.step_extractor import STEP_CHUNK_TOKENS
+from common.ratelimit import DomainRateLimiter
+from common import openai_client
 
-if not api_key:
-    print("⚠️ 경고: .env 파일에서 OPENAI_API_KEY를 찾을 수 없습니다.")
+YT_WORKERS = int(os.getenv("YT_WORKERS", "4"))                  # 동시에 처리할 영상 수
+YT_MIN_INTERVAL = float(os.getenv("YT_MIN_INTERVAL", "1"))      # youtube 요청 사이 최소 간격(초)
+YT_JITTER = float(os.getenv("YT_JITTER", "1"))                  # 간격에 더할 랜덤 지터(초)
+
+# transcript API → yt-dlp 자막 순서로 시도 (브라우저/오디오는 scraper, whisper 에서만)
+# 영상 사이 고정 sleep 대신 모든 워커가 같은 요청 간격 제한기를 공유
+chain = TranscriptChain(cheap_tiers(), limiter=DomainRateLimiter(YT_MIN_INTERVAL, YT_JITTER))
 
-client = OpenAI(
-    api_key=api_key,
-    base_url=api_base
-)
+if not openai_client.has_credentials():
+    print("⚠️ 경고: .env 파일에서 OPENAI_API_KEY를 찾을 수 없습니다.")
 
 csv_file_path = 'data/recipes_data.csv'
+output_path = 'data/recipe_steps.csv'
+STEP_COLUMNS = ['recipe_video_id', 'step_number', 'time_stamp', 'description']
 
 
 try:
@@ -50,43 +56,15 @@ def get_video_transcript(video_url):
 
         print(f"   🎬 동영상 {video_id} 의 자막을 가져오는 중...")
 
-        # ✅ [수정됨] 사용자 요청 방식: 인스턴스 생성 -> fetch 호출
-        ytt_api = YouTubeTranscriptApi()
-        
-        # languages=['ko', 'en']: 한국어 우선, 없으면 영어
-        transcript_obj = ytt_api.fetch(video_id, languages=['ko', 'en'])
-        
-        # ✅ 문서 내용 반영: 객체인 경우 .to_raw_data()로 딕셔너리 리스트 변환
-        # (만약 일반 리스트가 반환되더라도 안전하게 처리)
-        if hasattr(transcript_obj, 'to_raw_data'):
-            transcript = transcript_obj.to_raw_data()
-        else:
-            transcript = transcript_obj
-
-        full_text = ""
-        for t in transcript:
-            # 딕셔너리 접근 ('text', 'start')
-            # 만약 객체라면 t.text, t.start로 접근해야 함 (호환성 확보)
-            if isinstance(t, dict):
-                text = t.get('text', '')
-                start = t.get('start', 0.0)
-            else:
-                text = getattr(t, 'text', '')
-                start = getattr(t, 'start', 0.0)
-
-            minutes = int(start // 60)
-            seconds = int(start % 60)
-            timestamp = f"{minutes:02d}:{seconds:02d}"
-            full_text += f"[{timestamp}] {text} "
-
-        return full_text[:15000]
-
-    except (TranscriptsDisabled, NoTranscriptFound):
-        print(f"   ❌ 자막이 없는 영상입니다 (ID: {video_id})")
-        return None
-    except VideoUnavailable:
-        print(f"   ❌ 영상을 볼 수 없습니다 (ID: {video_id})")
-        return None
+        segments, tier = chain.fetch(video_id, video_url)
+        if not segments:
+            print(f"   ❌ 자막이 없는 영상입니다 (ID: {video_id})")
+            return None
+        print(f"   📝 자막 확보 ({tier})")
+
+        # 겹치는 자동 자막/추임새 제거, 시작 시간이 필요하므로 [MM:SS] 는 유지
+        return format_with_timestamps(segments, dedupe=tier in ROLLING_TIERS)
+
     except Exception as e:
         print(f"   ❌ 오류 발생: {e}")
         return None
@@ -116,65 +94,122 @@ def parse_steps_with_ai(transcript):
 """
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
+        result = openai_client.chat(
+            [
                 {"role": "system", "content": "너는 요리 레시피 정리 전문가야."},
                 {"role": "user", "content": prompt}
             ],
+            model="gpt-4o",
             response_format={"type": "json_object"}
         )
-
-        result = response.choices[0].message.content
         return json.loads(result).get("steps", [])
 
     except Exception as e:
         print(f"   ❌ AI 변환 실패: {e}")
         return []
 
-all_steps = []
-
-if not df.empty:
-    for index, row in df.iterrows():
-        video_id_key = row.get('recipe_video_id', f'unknown_{index}')
-        video_url = row.get('video_url', None)
-        title = row.get('video_title', 'No Title')
-
-        if not video_url or pd.isna(video_url):
-            print(f"⚠️ URL 없음 (ID: {video_id_key}) - 스킵")
-            continue
-
-        print(f"▶️ Processing [{index+1}/{len(df)}] ID {video_id_key}: {title}")
-
-        transcript = get_video_transcript(video_url)
-
-        if transcript:
-            steps = parse_steps_with_ai(transcript)
-            if steps:
-                print(f"   ✅ {len(steps)}개 단계 추출 성공")
-                for step in steps:
-                    if isinstance(step, dict):
-                        step['recipe_video_id'] = video_id_key
-                        all_steps.append(step)
-            else:
-                print("   ⚠️ AI 응답 없음")
-        else:
-            print("   Pass (자막 로드 실패)")
-        
-        time.sleep(random.uniform(2, 5))
-
-    if all_steps:
-        os.makedirs('data', exist_ok=True)
-        output_path = 'data/recipe_steps.csv'
-        steps_df = pd.DataFrame(all_steps)
-        
-        columns = ['recipe_video_id', 'step_number', 'time_stamp', 'description']
-        existing_cols = [c for c in columns if c in steps_df.columns]
-        steps_df = steps_df[existing_cols]
+def extract_steps_chunked(transcript):
+    """
+    긴 자막은 잘라내지 않고 STEP_CHUNK_TOKENS 단위로 나눠서 각각 추출한 뒤 순서대로 이어 붙임
+    (단계마다 time_stamp 가 있어서 이어 붙여도 순서가 유지됨)
+    """
+    chunks = split_by_tokens(transcript, STEP_CHUNK_TOKENS)
+    if len(chunks) > 1:
+        print(f"   ✂️ 긴 자막: {len(chunks)}개로 나눠서 추출")
+
+    steps = []
+    for chunk in chunks:
+        steps.extend(s for s in parse_steps_with_ai(chunk) if isinstance(s, dict))
+    for i, step in enumerate(steps, 1):
+        step['step_number'] = i
+    return steps
+
+def process_row(index, row):
+    """영상 하나: 자막 → 단계 추출 (워커 스레드에서 실행). return: (recipe_video_id, steps)"""
+    video_id_key = row.get('recipe_video_id', f'unknown_{index}')
+    print(f"▶️ Processing [{index+1}/{len(df)}] ID {video_id_key}: {row.get('video_title', 'No Title')}")
+
+    transcript = get_video_transcript(row.get('video_url'))
+    if not transcript:
+        print(f"   Pass (자막 로드 실패, ID: {video_id_key})")
+        return video_id_key, []
 
-        steps_df.to_csv(output_path, index=False, encoding='utf-8-sig')
-        print(f"\n🎉 변환 완료! '{output_path}' 저장됨.")
+    steps = extract_steps_chunked(transcript)
+    if steps:
+        print(f"   ✅ {len(steps)}개 단계 추출 성공 (ID: {video_id_key})")
+    else:
+        print(f"   ⚠️ AI 응답 없음 (ID: {video_id_key})")
+    return video_id_key, steps
+
+def append_steps(video_id_key, steps):
+    """영상 하나가 끝날 때마다 바로 파일에 추가 (메인 스레드에서만 호출)"""
+    if not steps:
+        return 0
+    steps_df = pd.DataFrame(steps)
+    steps_df['recipe_video_id'] = video_id_key
+    steps_df = steps_df.reindex(columns=STEP_COLUMNS)
+    steps_df.to_csv(output_path, index=False, mode='a', header=not os.path.exists(output_path), encoding='utf-8-sig')
+    return len(steps_df)
+
+def id_key(value):
+    try:
+        return str(int(float(value)))
+    except (TypeError, ValueError):
+        return str(value)
+
+def done_video_ids():
+    """이전 실행에서 이미 저장된 영상 (다시 실행하면 건너뜀)"""
+    if not os.path.exists(output_path):
+        return set()
+    saved = pd.read_csv(output_path, usecols=['recipe_video_id'])['recipe_video_id']
+    return set(saved.map(id_key))
+
+if __name__ == "__main__":
+    if df.empty:
+        print("처리할 데이터가 없습니다.")
+        sys.exit()
+
+    os.makedirs('data', exist_ok=True)
+    done = done_video_ids()
+    if done:
+        print(f"⏭️ 이미 저장된 영상 {len(done)}개 건너뜀")
+
+    totals = {'videos': 0, 'steps': 0}
+    # 동시에 떠 있는 작업은 최대 YT_WORKERS * 2 개 (실행 길이와 상관없이 메모리 일정)
+    with ThreadPoolExecutor(max_workers=YT_WORKERS) as pool:
+        pending = set()
+
+        def drain(return_when):
+            finished, _ = wait(pending, return_when=return_when)
+            for future in finished:
+                pending.discard(future)
+                written = append_steps(*future.result())
+                if written:
+                    totals['videos'] += 1
+                    totals['steps'] += written
+
+        for index, row in df.iterrows():
+            video_id_key = row.get('recipe_video_id', f'unknown_{index}')
+            video_url = row.get('video_url', None)
+
+            if not video_url or pd.isna(video_url):
+                print(f"⚠️ URL 없음 (ID: {video_id_key}) - 스킵")
+                continue
+            if id_key(video_id_key) in done:
+                continue
+
+            pending.add(pool.submit(process_row, index, row))
+            if len(pending) >= YT_WORKERS * 2:
+                drain(FIRST_COMPLETED)
+
+        if pending:
+            drain(ALL_COMPLETED)
+
+    if totals['videos']:
+        print(f"\n🎉 변환 완료! 영상 {totals['videos']}개, 단계 {totals['steps']}개 → '{output_path}' 저장됨.")
     else:
         print("\n⚠️ 생성된 데이터 없음.")
-else:
-    print("처리할 데이터가 없습니다.")
\ No newline at end of file
+
+    for tier, counts in chain.summary().items():
+        print(f"📝 자막({tier}): 성공 {counts['ok']}개 / 실패 {counts['failed']}개")
+    openai_client.print_usage()